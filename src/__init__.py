@@ -1,6 +1,12 @@
 """LINE Thrift Compiler Package"""
 
-from .thrift_compiler import main
-
 __version__ = "1.0.0"
 __all__ = ["main"]
+
+
+def __getattr__(name):
+    # Import the compiler lazily so importing the package stays cheap
+    if name == "main":
+        from .thrift_compiler import main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
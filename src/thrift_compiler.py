@@ -3,12 +3,14 @@
 Unified Thrift IDL Compiler for LINE APK
 Extracts complete Thrift definitions from decompiled Java sources
 """
+import os
 import re
 import sys
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 from collections import defaultdict
-import json
-from datetime import datetime
+from contextlib import nullcontext
 
 # Thrift reserved keywords that must be escaped
 THRIFT_RESERVED = {
@@ -22,6 +24,7 @@ THRIFT_RESERVED = {
     'xsd_attrs', 'async'
 }
 
+@lru_cache(maxsize=4096)
 def escape_reserved(name):
     """Escape Thrift reserved keywords and invalid identifiers."""
     if not name:
@@ -32,10 +35,10 @@ def escape_reserved(name):
     # Check if it's a reserved keyword
     if name.lower() in THRIFT_RESERVED:
         return name + '_'
-    # Ensure it's a valid identifier
-    if not re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', name):
+    # Ensure it's a valid identifier (ASCII isidentifier() is the common fast path)
+    if not (name.isascii() and name.isidentifier()) and not re_identifier.match(name):
         # Replace invalid chars with underscore
-        name = re.sub(r'[^A-Za-z0-9_]', '_', name)
+        name = re_invalid_ident_chars.sub('_', name)
         if name[0].isdigit():
             name = 'n_' + name
     return name
@@ -50,18 +53,28 @@ SMALI_ROOTS = globals().get('SMALI_ROOTS', [
     Path('/workspaces/LINE/line_decompiled/smali_classes4'),
 ])
 OUTPUT_FILE = globals().get('OUTPUT_FILE', Path('/workspaces/LINE/line.thrift'))
+# Trees at least this large are read and prescanned in worker processes
+PARALLEL_MIN_FILES = globals().get('PARALLEL_MIN_FILES', 2000)
 
-if not JAVA_ROOT.exists():
-    print(f'Error: {JAVA_ROOT} not found', file=sys.stderr)
-    sys.exit(1)
+def _check_java_root():
+    """Exit with status 1 when JAVA_ROOT does not exist."""
+    if not JAVA_ROOT.exists():
+        print(f'Error: {JAVA_ROOT} not found', file=sys.stderr)
+        sys.exit(1)
 
 # Regex patterns for parsing
+re_identifier = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+re_invalid_ident_chars = re.compile(r'[^A-Za-z0-9_]')
+re_leading_word = re.compile(r'[A-Za-z0-9_]+')
+re_digits = re.compile(r'\d+')
+re_type_ref = re.compile(r'^[A-Za-z_][A-Za-z0-9_.<>\[\]]*$')
 re_class_enum = re.compile(r'public\s+enum\s+(\w+)')
 re_enum_value = re.compile(r'(\w+)\s*\((?:\s*"[^"]*"\s*,)?\s*(\d+)\s*(?:,\s*(\d+))?\s*\)')
 # Match classes implementing Thrift interfaces (both lowercase like .k and uppercase like .d)
 # Match classes that implement thrift, possibly after extends
 re_class_struct = re.compile(r'public\s+(?:final\s+)?class\s+(\w+)\s+(?:extends\s+[^ {]+\s+)?implements\s+org\.apache\.thrift\.[a-zA-Z]')
 # Match field constants - handle both ww1.c and ww1.\w patterns, including line breaks
+re_field_const_named = re.compile(r'public\s+static\s+final\s+ww1\.\s*c\s+(\w+)\s*=\s*new\s+ww1\.\s*c\s*\(\s*"(\w+)"\s*,\s*\(byte\)\s*(\d+)\s*,\s*(\d+)\s*\)')
 re_field_const = re.compile(r'public\s+static\s+final\s+(?:ww1\.)?c\s+(\w+)\s*=\s*new\s+(?:ww1\.)?c\([^,]+,\s*\(byte\)\s*(\d+),\s*(\d+)\)', re.DOTALL)
 # Match member variables including generics like ArrayList, HashMap etc
 # Match member variables (support both obfuscated f\d+ and named variables)
@@ -69,6 +82,9 @@ re_field_const = re.compile(r'public\s+static\s+final\s+(?:ww1\.)?c\s+(\w+)\s*=\
 #   public HashMap<String, ArrayList<User>> f8;
 re_member_var = re.compile(r'public\s+(?!static)([\w\.<>\[\],\s]+?)\s+(\w+)\s*;')
 re_read_method = re.compile(r'\.read\([\w\s]*\)')
+# Response/Request fallback: public class X implements ...
+re_class_implements = re.compile(r'public\s+class\s+(\w+)\s+implements\s+[^{]+')
+re_new_instance = re.compile(r'new\s+(\w+)\(\)')
 re_gvar_x = re.compile(r'gVar\.x\(\s*(\d+)\s*\)')
 re_gvar_x_const = re.compile(r'gVar\.x\(\s*(\w+\.\w+)\s*\)')
 re_map_header = re.compile(r'gVar\.D\(new\s+e\(\(byte\)\s*(\d+),\s*\(byte\)\s*(\d+),')
@@ -77,6 +93,15 @@ re_set_header = re.compile(r'gVar\.G\(new\s+j\(\(byte\)\s*(\d+),')
 re_map_key_cast = re.compile(r'gVar\.[A-Z]\(\((\w+)\)\s*entry\.getKey\(\)\)')
 re_map_val_cast = re.compile(r'\(\((\w+)\)\s*entry\.getValue\(\)\)')
 re_map_val_getValue = re.compile(r'entry\.getValue\(\)\)\.getValue\(\)')
+
+# Per-field patterns; field names repeat across structs, so keep them compiled
+@lru_cache(maxsize=4096)
+def _field_block_re(fname):
+    return re.compile(rf'{re.escape(fname)}\s*=.*?{{([\s\S]*?)}}')
+
+@lru_cache(maxsize=4096)
+def _enum_valueof_re(fname):
+    return re.compile(rf'{re.escape(fname)}\s*=\s*(\w+)\.valueOf\(gVar\.x\(\)\)')
 # More permissive client method matcher capturing return type, method name, optional arg type, and b("tag")
 re_client_method = re.compile(
     r'public\s+final\s+([A-Za-z0-9_\.<>\[\]]+)\s+(\w+)\(\s*([A-Za-z0-9_\.<>\[\]]+)?(?:\s+\w+)?\s*\)'
@@ -86,6 +111,16 @@ re_client_method = re.compile(
 re_method_args_class = re.compile(r'class\s+(\w+)_args\b')
 re_method_result_class = re.compile(r'class\s+(\w+)_result\b')
 # Match public fields including those with package names
+# Wrapper fields: /* comment */ public T name;  or a line-leading public T name;
+re_commented_public_field = re.compile(r'/\*[^*]*\*/\s*public\s+([A-Za-z0-9_\.]+(?:<[^>]+>)?)\s+([A-Za-z0-9_]+);')
+re_public_field_line = re.compile(r'^\s*public\s+([A-Za-z0-9_\.]+(?:<[^>]+>)?)\s+([A-Za-z0-9_]+);', re.MULTILINE)
+# Same field shape confined to one line, for scanning a window in place
+re_public_field_any = re.compile(r'public[^\S\n]+([A-Za-z0-9_\.]+(?:<[^>\n]+>)?)[^\S\n]+([A-Za-z0-9_]+);')
+# First 100 lines of a window (99 newlines plus the rest of the last line)
+re_first_100_lines = re.compile(r'(?:[^\n]*\n){99}[^\n]*')
+re_final_method_sig = re.compile(r'public\s+final\s+([A-Za-z0-9_\.<>\[\]]+)\s+(\w+)\s*\(([^)]*)\)')
+re_client_inner_class = re.compile(r'class\s+(\w+)\$Client\b')
+re_service_client_class = re.compile(r'class\s+(\w+Service)Client\b')
 re_public_field = re.compile(r'public\s+(?!static)([\w\.]+(?:<[^>]+>)?)\s+(\w+);')
 re_call_b = re.compile(r'\.[ab]\(\s*"([A-Za-z0-9_]+)"\s*,\s*(\w+)\s*\)')
 re_new_var = re.compile(r'(\w+)\s+(\w+)\s*=\s*new\s+(\w+)\s*\(\s*\)')
@@ -93,6 +128,16 @@ re_kotlin_meta_serviceclient = re.compile(r'"([A-Za-z0-9_.]*ServiceClient)"')
 re_kotlin_meta_method = re.compile(r'm\s*=\s*"([A-Za-z0-9_]+)"')
 re_wrapper_tostring = re.compile(r'new\s+StringBuilder\s*\("([A-Za-z0-9_]+)_(args|result)\(')
 re_b_only = re.compile(r'\bb\("([A-Za-z0-9_]+)"\)')
+# re_final_method_sig or re_b_only in one pass; tag is set only for b("...").
+# Both branches open with a literal and the \b is written as a lookbehind after
+# the b so the engine can still skip ahead on the two first characters
+re_final_sig_or_b = re.compile(
+    r'(?:' + re_final_method_sig.pattern + r'|b(?<!\wb)\("(?P<tag>[A-Za-z0-9_]+)"\))'
+)
+# toString() naming a Response/Request: return "XResponse(" anywhere in the file
+# wins over StringBuilder("XResponse(", which is only the fallback
+re_java_response_return = re.compile(r'return\s+"(\w+(?:Response|Request))\(')
+re_java_response_builder = re.compile(r'StringBuilder\("(\w+(?:Response|Request))\(')
 
 # --- Smali parsing helpers ---
 # .class public final Lcom/foo/Bar;
@@ -134,20 +179,38 @@ def _smali_desc_to_java_simple(desc: str) -> str:
             return 'String'
         return simple
     # Primitives
-    prim = {
-        'I': 'int', 'J': 'long', 'S': 'short', 'B': 'byte', 'Z': 'boolean', 'D': 'double', 'F': 'float', 'C': 'char'
-    }
-    return prim.get(d, 'binary')
+    return SMALI_PRIMITIVES.get(d, 'binary')
 
 def _iter_existing_smali_roots():
     for r in SMALI_ROOTS:
         if isinstance(r, Path) and r.exists():
             yield r
 
+def _walk_files(root, suffix):
+    """Yield paths under root whose name ends with suffix, in rglob order.
+
+    Uses os.scandir directly so non-matching entries never become Path objects
+    and directory checks reuse the cached dirent type.
+    """
+    stack = [os.fspath(root)]
+    while stack:
+        d = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        subdirs.append(e.path)
+                    elif e.name.endswith(suffix):
+                        yield Path(e.path)
+        except OSError:
+            continue
+        # Visit subdirectories depth-first in listing order, as rglob does
+        stack.extend(reversed(subdirs))
+
 def _iter_smali_files():
     for r in _iter_existing_smali_roots():
-        for p in r.rglob('*.smali'):
-            yield p
+        yield from _walk_files(r, '.smali')
 
 def _rel_to_any(p: Path):
     # Best-effort relative path for stable keys across Java/Smali roots
@@ -159,14 +222,41 @@ def _rel_to_any(p: Path):
             continue
     return str(p)
 
+# Java type names to Thrift types
+JAVA_TO_THRIFT_PRIMITIVE = {
+    # primitives
+    'long': 'i64', 'int': 'i32', 'short': 'i16', 'double': 'double', 'float': 'double',
+    'boolean': 'bool', 'byte': 'i8', 'string': 'string', 'void': 'void', 'binary': 'binary',
+    # Boxed/Capitalized Java types
+    'Long': 'i64', 'Integer': 'i32', 'Short': 'i16', 'Double': 'double', 'Float': 'double',
+    'Boolean': 'bool', 'Byte': 'i8', 'String': 'string', 'Character': 'i16',
+    # Common binary-like representations
+    'Object': 'binary', 'byte[]': 'binary', 'ByteBuffer': 'binary'
+}
+# Member variable declared types that imply a primitive field type
+MEMBER_TO_THRIFT_PRIMITIVE = {
+    'long': 'i64', 'int': 'i32', 'short': 'i16', 'double': 'double', 'float': 'double',
+    'boolean': 'bool', 'byte': 'i8', 'String': 'string', 'Integer': 'i32'
+}
+# Smali primitive descriptors
+SMALI_PRIMITIVES = {
+    'I': 'int', 'J': 'long', 'S': 'short', 'B': 'byte', 'Z': 'boolean', 'D': 'double', 'F': 'float', 'C': 'char'
+}
+
 # Type mapping
 TYPE_MAP = {
     1: 'bool', 2: 'bool', 3: 'i8', 4: 'double', 6: 'i16', 8: 'i32', 10: 'i64',
     11: 'string', 12: 'struct', 13: 'map', 14: 'set', 15: 'list', 16: 'enum'
 }
+# Thrift base types accepted as container elements, map keys and signature types
+BASE_THRIFT_TYPES = frozenset({'bool', 'i8', 'i16', 'i32', 'i64', 'double', 'string', 'binary'})
+MAP_KEY_BASE_TYPES = frozenset({'bool', 'byte', 'i8', 'i16', 'i32', 'i64', 'double', 'string'})
+SIGNATURE_BASE_TYPES = BASE_THRIFT_TYPES | {'void'}
 
 # Data structures
 class Field:
+    __slots__ = ('id', 'name', 'ttype', 'type_name', 'key_type', 'val_type', 'required')
+
     def __init__(self, id, name, ttype, type_name=None, key_type=None, val_type=None, required=False):
         self.id = id
         self.name = name
@@ -177,37 +267,48 @@ class Field:
         self.required = required
 
 class ThriftEnum:
+    __slots__ = ('name', 'values')
+
     def __init__(self, name):
         self.name = name
         self.values = []
 
 class ThriftStruct:
+    __slots__ = ('name', 'fields')
+
     def __init__(self, name):
         self.name = name
         self.fields = []
 
 class ThriftService:
+    __slots__ = ('name', 'methods', '_methods_by_name')
+
     def __init__(self, name):
         self.name = name
         self.methods = []
+        self._methods_by_name = {}
+
+    def has_method(self, name):
+        return name in self._methods_by_name
 
     def add_method(self, name, arg_type, ret_type, exceptions=None):
         exceptions = exceptions or []
-        for m in self.methods:
-            if m['name'] == name:
-                if m['arg_type'] in (None, 'binary') and arg_type not in (None, 'binary'):
-                    m['arg_type'] = arg_type
-                if m['ret_type'] in (None, 'void', 'binary') and ret_type not in (None, 'void', 'binary'):
-                    m['ret_type'] = ret_type
-                if not m['exceptions'] and exceptions:
-                    m['exceptions'] = exceptions
-                return
-        self.methods.append({
+        m = self._methods_by_name.get(name)
+        if m is not None:
+            if m['arg_type'] in (None, 'binary') and arg_type not in (None, 'binary'):
+                m['arg_type'] = arg_type
+            if m['ret_type'] in (None, 'void', 'binary') and ret_type not in (None, 'void', 'binary'):
+                m['ret_type'] = ret_type
+            if not m['exceptions'] and exceptions:
+                m['exceptions'] = exceptions
+            return
+        m = self._methods_by_name[name] = {
             'name': name,
             'arg_type': arg_type,
             'ret_type': ret_type,
             'exceptions': exceptions
-        })
+        }
+        self.methods.append(m)
 
 # Global registries
 enums = {}
@@ -220,6 +321,17 @@ response_map = {}
 exception_name_alias = {}  # original simple name -> emitted exception name
 emitted_exception_names = set()  # set of emitted exception type names
 global_type_names = set()  # Track ALL type names (enums, structs, services) globally to prevent duplicates
+type_name_suffix = {}  # base name -> next _N suffix to try; names below it are already taken
+
+# Sources read once per compile run by load_sources(); main() drops them again
+# after its parse passes, so direct parse_* calls always see the current tree
+java_sources = None
+smali_sources = None
+# Per-file prescan results, aligned with java_sources
+java_scans = None
+# The java_sources list response_map was built from; parse_services() only
+# reuses the map parse_structs() left when it was built for the same sources
+response_map_sources = None
 
 def read_file(p):
     try:
@@ -228,8 +340,124 @@ def read_file(p):
     except Exception:
         return ''
 
+def _iter_java_files():
+    return _walk_files(JAVA_ROOT, '.java')
+
+def _rel_to_java_root(p: Path):
+    ps = str(p)
+    if isinstance(JAVA_ROOT, Path):
+        # Walked paths sit under the root; slice the prefix instead of relative_to
+        prefix = os.path.join(str(JAVA_ROOT), '')
+        if ps.startswith(prefix):
+            return ps[len(prefix):]
+    try:
+        return str(p.relative_to(JAVA_ROOT))
+    except Exception:
+        return ps
+
+def _java_sources():
+    """Return (path, rel_key, text) for every Java source, reusing the run's cache."""
+    if java_sources is not None:
+        return java_sources
+    return [(p, _rel_to_java_root(p), read_file(p)) for p in _iter_java_files()]
+
+def _coerce_enum_value(v: str):
+    # Preserve leading zeros; otherwise convert to int where possible
+    if re_digits.fullmatch(v):
+        if len(v) > 1 and v.startswith('0'):
+            return v
+        try:
+            return int(v)
+        except Exception:
+            return v
+    return v
+
+def _scan_java_source(s):
+    """Extract the per-file facts the independent scan passes need.
+
+    Returns (enum_hit, tostring_name, wrapper_hits, kotlin_client_hit). This
+    depends only on the text, so it can run in a worker process.
+    """
+    enum_hit = None
+    if 'enum' in s:
+        m = re_class_enum.search(s)
+        if m:
+            values = [(vm.group(1), _coerce_enum_value(vm.group(2))) for vm in re_enum_value.finditer(s)]
+            enum_hit = (m.group(1), values)
+    tostring_name = None
+    if 'Response(' in s or 'Request(' in s:
+        m = re_java_response_return.search(s) or re_java_response_builder.search(s)
+        if m:
+            tostring_name = m.group(1)
+    wrapper_hits = ()
+    if '_args(' in s or '_result(' in s:
+        wrapper_hits = re_wrapper_tostring.findall(s)
+    kotlin_client_hit = None
+    if 'ServiceClient' in s:
+        m = re_kotlin_meta_serviceclient.search(s)
+        if m:
+            kotlin_client_hit = (m.group(1), re_kotlin_meta_method.findall(s))
+    return enum_hit, tostring_name, wrapper_hits, kotlin_client_hit
+
+# Literals the struct and service passes gate on. A file containing none of
+# them is only ever seen by the prescan, so its text need not be kept
+JAVA_TEXT_MARKERS = ('org.apache.thrift', 'Response(', 'Request(', '_args', '_result',
+                     'b("', 'ServiceClient', '$Client')
+
+def _needs_java_text(p, s):
+    if any(marker in s for marker in JAVA_TEXT_MARKERS):
+        return True
+    # parse_structs also picks up implementing classes named *Response/*Request
+    return 'implements' in s and ('Response' in p.stem or 'Request' in p.stem)
+
+def _load_java_file(p):
+    s = read_file(p)
+    scan = _scan_java_source(s)
+    if not _needs_java_text(p, s):
+        # Keeps memory down and avoids shipping the text back from a worker
+        s = ''
+    return s, scan
+
+def _java_scans(sources):
+    """Return prescan results aligned with sources, reusing the run's cache."""
+    if java_scans is not None and sources is java_sources:
+        return java_scans
+    return [_scan_java_source(s) for _, _, s in sources]
+
+def _smali_sources():
+    """Return (path, rel_key, text) for every Smali source, reusing the run's cache."""
+    if smali_sources is not None:
+        return smali_sources
+    return [(p, _rel_to_any(p), read_file(p)) for p in _iter_smali_files()]
+
+def load_sources():
+    """Walk and read all sources once so every parsing pass shares them."""
+    global java_sources, smali_sources, java_scans
+    java_sources = None
+    smali_sources = None
+    java_scans = None
+    paths = list(_iter_java_files())
+    loaded = None
+    if len(paths) >= PARALLEL_MIN_FILES and (os.cpu_count() or 1) > 1:
+        # Reading and prescanning are per-file pure work; spread it over cores.
+        # Only large trees need the pool; keep multiprocessing off the CLI startup path
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            with ProcessPoolExecutor() as ex:
+                loaded = list(ex.map(_load_java_file, paths, chunksize=64))
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            # No usable pool, or a worker died (e.g. OOM-killed); read serially
+            loaded = None
+    if loaded is None:
+        loaded = [_load_java_file(p) for p in paths]
+    java_sources = [(p, _rel_to_java_root(p), s) for p, (s, _) in zip(paths, loaded)]
+    java_scans = [scan for _, scan in loaded]
+    smali_sources = _smali_sources()
+
 def _primitive_to_thrift(t: str) -> str:
-    if not t:
+    if not t or t in SIGNATURE_BASE_TYPES:
+        # Already a Thrift base type (or void); the mapping would return it as is
         return t
     # Clean up malformed types
     if '...' in str(t):
@@ -237,22 +465,40 @@ def _primitive_to_thrift(t: str) -> str:
     if '.' in str(t) and not t.startswith('java.'):
         # Keep only the last part after dots (unless it's a package name)
         t = t.split('.')[-1]
-    mapping = {
-        # primitives
-        'long': 'i64', 'int': 'i32', 'short': 'i16', 'double': 'double', 'float': 'double',
-        'boolean': 'bool', 'byte': 'i8', 'string': 'string', 'void': 'void', 'binary': 'binary',
-        # Boxed/Capitalized Java types
-        'Long': 'i64', 'Integer': 'i32', 'Short': 'i16', 'Double': 'double', 'Float': 'double',
-        'Boolean': 'bool', 'Byte': 'i8', 'String': 'string', 'Character': 'i16',
-        # Common binary-like representations
-        'Object': 'binary', 'byte[]': 'binary', 'ByteBuffer': 'binary'
-    }
-    result = mapping.get(t, t)
+    result = JAVA_TO_THRIFT_PRIMITIVE.get(t, t)
     # Validate the result is a valid Thrift identifier
-    if not re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', result):
+    if not re_identifier.match(result):
         return 'binary'  # Default for invalid identifiers
     return result
 
+# Imported as src.thrift_compiler, normalize_type_name keeps the container
+# wrapper (list<T>, map<K,V>); imported top-level it returns the element type
+_EMIT_GENERIC = __name__ == 'src.thrift_compiler'
+
+def _split_generic_args(inner):
+    """Split generic arguments on top-level commas, stripping each part."""
+    if '<' not in inner and '>' not in inner:
+        # Flat arguments (the common case): every comma is top-level
+        parts = [part.strip() for part in inner.split(',')]
+    else:
+        parts = []
+        depth = 0
+        start = 0
+        for i, ch in enumerate(inner):
+            if ch == '<':
+                depth += 1
+            elif ch == '>':
+                depth -= 1
+            elif ch == ',' and depth == 0:
+                parts.append(inner[start:i].strip())
+                start = i + 1
+        parts.append(inner[start:].strip())
+    if not parts[-1]:
+        parts.pop()
+    return parts
+
+# Pure in its input; the same few Java type strings recur across every file
+@lru_cache(maxsize=4096)
 def normalize_type_name(t):
     """Return a simplified, normalized Java type name.
 
@@ -263,9 +509,7 @@ def normalize_type_name(t):
     """
     if not t:
         return None
-    t = str(t)
-    if '.' in t:
-        t = t.split('.')[-1]
+    t = str(t).rpartition('.')[2]
     t = t.replace('$', '')
     t = t.strip()
     # Handle generics (module-aware behavior) with arbitrary container names
@@ -275,45 +519,38 @@ def normalize_type_name(t):
         base = t[:lt]
         inner = t[lt+1:gt]
         base_lower = base.lower()
-        # Split top-level generics safely
-        parts = []
-        depth = 0
-        buf = ''
-        for ch in inner:
-            if ch == '<':
-                depth += 1
-            elif ch == '>':
-                depth -= 1
-            if ch == ',' and depth == 0:
-                parts.append(buf.strip())
-                buf = ''
-            else:
-                buf += ch
-        if buf.strip():
-            parts.append(buf.strip())
+        parts = _split_generic_args(inner)
         # List-like
         if base_lower.endswith('list'):
             elem = normalize_type_name(parts[0]) if parts else None
-            if __name__ == 'src.thrift_compiler':
+            if _EMIT_GENERIC:
                 return f"list<{elem}>" if elem else None
             return elem
         # Set-like
         if base_lower.endswith('set'):
             elem = normalize_type_name(parts[0]) if parts else None
-            if __name__ == 'src.thrift_compiler':
+            if _EMIT_GENERIC:
                 return f"set<{elem}>" if elem else None
             return elem
         # Map-like
         if base_lower.endswith('map') and len(parts) == 2:
             k = normalize_type_name(parts[0])
             v = normalize_type_name(parts[1])
-            if __name__ == 'src.thrift_compiler':
+            if _EMIT_GENERIC:
                 return f"map<{k},{v}>"
             return v
     # Keep only leading ASCII word characters
-    m = re.match(r'[A-Za-z0-9_]+', t)
+    m = re_leading_word.match(t)
     return m.group(0) if m else None
 
+def _suffixed_type_name(base, taken=()):
+    """Return base_N for the lowest N >= 2 not in global_type_names or taken."""
+    suffix = type_name_suffix.get(base, 2)
+    while f"{base}_{suffix}" in global_type_names or f"{base}_{suffix}" in taken:
+        suffix += 1
+    type_name_suffix[base] = suffix + 1
+    return f"{base}_{suffix}"
+
 def camel_case(snake_str):
     components = snake_str.split('_')
     return ''.join(x.title() for x in components)
@@ -322,100 +559,88 @@ def parse_enums():
     print("Parsing enums...")
     global global_type_names
     global_type_names.clear()  # Start fresh
-    for p in JAVA_ROOT.rglob('*.java'):
-        s = read_file(p)
-        m = re_class_enum.search(s)
-        if not m:
+    type_name_suffix.clear()
+    for enum_hit, _, _, _ in _java_scans(_java_sources()):
+        if not enum_hit:
             continue
-        name = m.group(1)
+        name, values = enum_hit
         en = ThriftEnum(name)
         existing = set()
-        def _coerce_enum_value(v: str):
-            # Preserve leading zeros; otherwise convert to int where possible
-            if re.fullmatch(r'\d+', v):
-                if len(v) > 1 and v.startswith('0'):
-                    return v
-                try:
-                    return int(v)
-                except Exception:
-                    return v
-            return v
-        for vm in re_enum_value.finditer(s):
-            vname = vm.group(1)
-            vvalue = _coerce_enum_value(vm.group(2))
+        for vname, vvalue in values:
             if vname not in existing:
                 en.values.append((vname, vvalue))
                 existing.add(vname)
         if en.values:
-            dup_values = {}
+            # Names sharing a value collapse to the alphabetically first one
+            keep = {}
             for vname, vvalue in en.values:
-                if vvalue not in dup_values:
-                    dup_values[vvalue] = []
-                dup_values[vvalue].append(vname)
-            to_skip = set()
-            for vvalue, names in dup_values.items():
-                if len(names) > 1:
-                    names.sort()
-                    for cname in names[1:]:
-                        to_skip.add(cname)
-            en.values = [(n, v) for n, v in en.values if n not in to_skip]
-            if len(en.values) > 0:
-                existing.clear()
-                for n, v in en.values:
-                    if n in existing:
-                        continue
-                    existing.add(n)
-                global_type_names.add(name)  # Track enum names
-                enums[name] = en
+                if vvalue not in keep or vname < keep[vvalue]:
+                    keep[vvalue] = vname
+            en.values = [(n, v) for n, v in en.values if keep[v] == n]
+            global_type_names.add(name)  # Track enum names
+            enums[name] = en
+
+def _join_field_const_lines(s):
+    """Join field constant declarations that the decompiler split across lines."""
+    lines = s.split('\n')
+    parts = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if 'public static final ww1.' in line:
+            # Join this declaration until we find the closing parenthesis
+            declaration = [line]
+            closed = ');' in line
+            while i < len(lines) and not closed:
+                cont = lines[i].strip()
+                declaration.append(cont)
+                closed = ');' in cont
+                i += 1
+            parts.append(' '.join(declaration))
+        else:
+            parts.append(line)
+    parts.append('')
+    return '\n'.join(parts)
+
+def build_class_to_response_map(sources, smali):
+    """Build mapping from obfuscated class names like X3 to response/request names"""
+    mapping = {}
+    # Java
+    for (p, rel_path, _), (_, tostring_name, _, _) in zip(sources, _java_scans(sources)):
+        if tostring_name:
+            mapping[rel_path] = tostring_name
+    # Smali
+    for sp, rel_path, s in smali:
+        if 'Response(' not in s and 'Request(' not in s:
+            continue
+        m = re_smali_response_tostring.search(s)
+        if m:
+            mapping[rel_path] = m.group(1)
+    return mapping
 
 def parse_structs():
     print("Parsing structs...")
-    obfuscated_map = {}
     global global_type_names  # Use the global set
+    global response_map, response_map_sources
     # Don't clear - we need enum names from parse_enums()
-    # Helper to index obfuscated Response/Request names from both Java and Smali
-    def _add_obfuscated_from_java():
-        for p in JAVA_ROOT.rglob('*.java'):
-            s = read_file(p)
-            # Look for toString() that returns Response/Request names (including with fields)
-            toString_patterns = [
-                re.search(r'return\s+"(\w+(?:Response|Request))\(', s),
-                re.search(r'StringBuilder\("(\w+(?:Response|Request))\(', s)
-            ]
-            for match in toString_patterns:
-                if match:
-                    real_name = match.group(1)
-                    try:
-                        obfuscated_key = str(p.relative_to(JAVA_ROOT))
-                    except Exception:
-                        obfuscated_key = str(p)
-                    obfuscated_map[obfuscated_key] = real_name
-                    break
-    def _add_obfuscated_from_smali():
-        for p in _iter_smali_files():
-            s = read_file(p)
-            m = re_smali_response_tostring.search(s)
-            if m:
-                real_name = m.group(1)
-                obfuscated_map[_rel_to_any(p)] = real_name
-    
-    _add_obfuscated_from_java()
-    _add_obfuscated_from_smali()
-    # First pass: find all obfuscated classes that have Response/Request toString methods
+    sources = _java_sources()
+    smali = _smali_sources()
+    # First pass: find all obfuscated classes that have Response/Request toString methods.
+    # parse_services() reuses the same map instead of rescanning.
+    response_map = build_class_to_response_map(sources, smali)
+    # Standalone calls read a fresh list each time; only the run's cache can match
+    response_map_sources = sources if sources is java_sources else None
+    obfuscated_map = response_map
     print(f"Found {len(obfuscated_map)} obfuscated Response/Request mappings")
     
     # Second pass: parse all structs
-    for p in JAVA_ROOT.rglob('*.java'):
-        s = read_file(p)
-        m = re_class_struct.search(s)
+    for p, rel_path, s in sources:
+        m = re_class_struct.search(s) if 'org.apache.thrift' in s else None
         class_name = None
         use_obfuscated_name = False
         
         # Check if this file is an obfuscated Response/Request
-        try:
-            rel_path = str(p.relative_to(JAVA_ROOT))
-        except Exception:
-            rel_path = str(p)
         if rel_path in obfuscated_map:
             # Use the real name from toString
             class_name = obfuscated_map[rel_path]
@@ -424,7 +649,7 @@ def parse_structs():
             # Standard Thrift struct
             class_name = m.group(1)
         elif 'Response' in p.stem or 'Request' in p.stem:
-            class_match = re.search(r'public\s+class\s+(\w+)\s+implements\s+[^{]+', s)
+            class_match = re_class_implements.search(s)
             if class_match:
                 class_name = class_match.group(1)
             
@@ -434,38 +659,20 @@ def parse_structs():
             exception_structs.add(class_name)
         ts = ThriftStruct(class_name)
         fields_found = []
-        # Handle multi-line field constant declarations by joining lines
-        # Some files have field constants split across lines
-        lines = s.split('\n')
-        s_joined = ''
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            if 'public static final ww1.c' in line or 'public static final ww1.' in line:
-                # Join this declaration until we find the closing parenthesis
-                declaration = line
-                j = i + 1
-                while j < len(lines) and ');' not in declaration:
-                    declaration += ' ' + lines[j].strip()
-                    j += 1
-                s_joined += declaration + '\n'
-                i = j
-            else:
-                s_joined += line + '\n'
-                i += 1
-        
         # Now parse field constants - try both original and joined content
         # Pattern: new ww1.c("fieldname", (byte) TYPE, ID)
-        field_with_name = re.compile(r'public\s+static\s+final\s+ww1\.\s*c\s+(\w+)\s*=\s*new\s+ww1\.\s*c\s*\(\s*"(\w+)"\s*,\s*\(byte\)\s*(\d+)\s*,\s*(\d+)\s*\)')
+        field_with_name = re_field_const_named
         # Try original content first (for single-line declarations)
-        for fm in field_with_name.finditer(s):
+        has_ww1 = 'ww1.' in s
+        for fm in (field_with_name.finditer(s) if has_ww1 else ()):
             var_name = fm.group(1)  # Variable name like f5656b
             fname = fm.group(2)     # Field name like "responses"
             tcode = int(fm.group(3))
             fid = int(fm.group(4))
             fields_found.append((fid, fname, tcode))
         # If no fields found, try joined content (for multi-line declarations)
-        if not fields_found:
+        if not fields_found and 'public static final ww1.' in s:
+            s_joined = _join_field_const_lines(s)
             for fm in field_with_name.finditer(s_joined):
                 var_name = fm.group(1)
                 fname = fm.group(2)
@@ -474,7 +681,7 @@ def parse_structs():
                 fields_found.append((fid, fname, tcode))
         
         # Fallback to original pattern if no string name found
-        if not fields_found:
+        if not fields_found and 'final' in s:
             for fm in re_field_const.finditer(s):
                 fname = fm.group(1)
                 tcode = int(fm.group(2))
@@ -500,24 +707,23 @@ def parse_structs():
             return gstr
 
         def _primitive_from_member(vt: str) -> str:
-            vt = vt.strip()
-            mapping = {
-                'long': 'i64', 'int': 'i32', 'short': 'i16', 'double': 'double', 'float': 'double',
-                'boolean': 'bool', 'byte': 'i8', 'String': 'string', 'Integer': 'i32'
-            }
-            return mapping.get(vt)
+            return MEMBER_TO_THRIFT_PRIMITIVE.get(vt.strip())
 
         member_var_list = list(member_vars.items())
         container_vars = [(n, t) for (n, t) in member_var_list if '<' in t and '>' in t]
         cv_idx = 0
+        member_vars_lower = [(vn, vn.lower()) for vn in member_vars]
+        # Skip the per-field enum search when the file reads no enums at all
+        has_valueof = '.valueOf(gVar.x())' in s
         for idx_field, (fid, fname, tcode) in enumerate(fields_found):
             thrift_type = TYPE_MAP.get(tcode, 'i32')
             resolved_type = None
             key_type = None
             val_type = None
             mv_name = None
-            for vn, vt in member_vars.items():
-                if fname.lower() in vn.lower() or vn.lower() in fname.lower():
+            fname_lower = fname.lower()
+            for vn, vn_lower in member_vars_lower:
+                if fname_lower in vn_lower or vn_lower in fname_lower:
                     mv_name = vn
                     break
             if not mv_name and container_vars:
@@ -527,7 +733,7 @@ def parse_structs():
                     cv_idx += 1
             if thrift_type in ('list', 'set', 'map'):
                 read_section = s
-                read_match = re.search(rf'{fname}\s*=.*?{{([\s\S]*?)}}', read_section)
+                read_match = _field_block_re(fname).search(read_section)
                 if read_match:
                     read_block = read_match.group(1)
                     if thrift_type == 'map':
@@ -550,7 +756,7 @@ def parse_structs():
                         if list_header:
                             elem_tcode = int(list_header.group(1))
                             val_type = TYPE_MAP.get(elem_tcode, 'i32')
-                        inst = re.search(r'new\s+(\w+)\(\)', read_block)
+                        inst = re_new_instance.search(read_block)
                         if inst:
                             val_type = normalize_type_name(inst.group(1)) or val_type
                     elif thrift_type == 'set':
@@ -558,7 +764,7 @@ def parse_structs():
                         if set_header:
                             elem_tcode = int(set_header.group(1))
                             val_type = TYPE_MAP.get(elem_tcode, 'i32')
-                        inst = re.search(r'new\s+(\w+)\(\)', read_block)
+                        inst = re_new_instance.search(read_block)
                         if inst:
                             val_type = normalize_type_name(inst.group(1)) or val_type
                 # If still not resolved, try member variable generics
@@ -581,7 +787,7 @@ def parse_structs():
                             elem = inner
                         val_type = normalize_type_name(elem) or val_type
             elif thrift_type == 'i32':
-                enum_ref = re.search(rf'{fname}\s*=\s*(\w+)\.valueOf\(gVar\.x\(\)\)', s)
+                enum_ref = _enum_valueof_re(fname).search(s) if has_valueof else None
                 if enum_ref:
                     ename = enum_ref.group(1)
                     if ename in enums:
@@ -622,11 +828,7 @@ def parse_structs():
             # Ensure globally unique struct names (no collision with enums/services)
             original_name = class_name
             if class_name in global_type_names or class_name in structs:
-                suffix = 2
-                while (f"{original_name}_{suffix}" in global_type_names or 
-                       f"{original_name}_{suffix}" in structs):
-                    suffix += 1
-                class_name = f"{original_name}_{suffix}"
+                class_name = _suffixed_type_name(original_name, structs)
                 ts.name = class_name  # Update the struct's name too
             global_type_names.add(class_name)
             structs[class_name] = ts
@@ -644,15 +846,13 @@ def parse_structs():
                 print(f"  Added obfuscated class: {p.stem} -> {class_name} with {len(ts.fields)} fields")
 
     # Third pass: parse smali structs (minimal capture)
-    for p in _iter_smali_files():
-        s = read_file(p)
+    for p, relk, s in smali:
         class_name = None
-        mclass = re_smali_class.search(s)
+        mclass = re_smali_class.search(s) if '.class' in s else None
         if not mclass:
             continue
         simple_name = mclass.group(1).split('/')[-1].split('$')[-1]
         # Prefer deobfuscated Response/Request name if present
-        relk = _rel_to_any(p)
         if relk in obfuscated_map:
             class_name = obfuscated_map[relk]
         else:
@@ -671,10 +871,7 @@ def parse_structs():
         # Ensure unique name and register
         original_name = class_name
         if class_name in global_type_names or class_name in structs:
-            suffix = 2
-            while (f"{original_name}_{suffix}" in global_type_names or f"{original_name}_{suffix}" in structs):
-                suffix += 1
-            class_name = f"{original_name}_{suffix}"
+            class_name = _suffixed_type_name(original_name, structs)
             ts.name = class_name
         global_type_names.add(class_name)
         structs[class_name] = ts
@@ -682,59 +879,60 @@ def parse_structs():
 def parse_services():
     print("Building class index...")
     global class_index
-    for jp in JAVA_ROOT.rglob('*.java'):
-        try:
-            rel_path = jp.relative_to(JAVA_ROOT)
-            class_index[str(rel_path)] = jp
-        except Exception:
-            class_index[str(jp)] = jp
+    sources = _java_sources()
+    smali = _smali_sources()
+    for jp, rel_path, _ in sources:
+        class_index[rel_path] = jp
     # Include smali files in class index
-    for sp in _iter_smali_files():
-        class_index[_rel_to_any(sp)] = sp
+    for sp, rel_path, _ in smali:
+        class_index[rel_path] = sp
     
-    # Build mapping from obfuscated class names to response/request types
-    def build_class_to_response_map():
-        """Build mapping from obfuscated class names like X3 to response/request names"""
-        response_map = {}
-        # Java
-        for p in JAVA_ROOT.rglob('*.java'):
-            s = read_file(p)
-            toString_patterns = [
-                re.search(r'return\s+"(\w+(?:Response|Request))\(', s),
-                re.search(r'StringBuilder\("(\w+(?:Response|Request))\(', s)
-            ]
-            for match in toString_patterns:
-                if match:
-                    real_name = match.group(1)
-                    try:
-                        rel_path = str(p.relative_to(JAVA_ROOT))
-                    except Exception:
-                        rel_path = str(p)
-                    response_map[rel_path] = real_name
-                    break
-        # Smali
-        for sp in _iter_smali_files():
-            s = read_file(sp)
-            m = re_smali_response_tostring.search(s)
-            if m:
-                response_map[_rel_to_any(sp)] = m.group(1)
-        return response_map
-
-    global response_map
-    response_map = build_class_to_response_map()
+    global response_map, response_map_sources
+    if response_map_sources is not sources:
+        # parse_structs() built the map for this run's sources; otherwise scan
+        response_map = build_class_to_response_map(sources, smali)
+        response_map_sources = sources if sources is java_sources else None
     print(f"Found {len(response_map)} obfuscated Response mappings")
 
+    # (path, rel_path) per class stem in class_index order, so lookups see the
+    # same first hit a linear scan would
+    stem_to_paths = defaultdict(list)
+    for rel_path, path in class_index.items():
+        stem_to_paths[path.stem].append((path, rel_path))
+    # Wrapper texts by rel_path, starting from what load_sources() already read;
+    # only class_index entries from elsewhere go back to disk, once each.
+    # load_sources() blanks Java files without JAVA_TEXT_MARKERS, so an empty
+    # text is a miss, not the file's content
+    wrapper_texts = {rel_path: s for _, rel_path, s in sources if s}
+    wrapper_texts.update((rel_path, s) for _, rel_path, s in smali if s)
+    def _wrapper_text(path, rel_path):
+        text = wrapper_texts.get(rel_path)
+        if text is None:
+            text = wrapper_texts[rel_path] = read_file(path)
+        return text
+
+    # Method name -> Response struct named after it, e.g.
+    # approveSquareMembers -> ApproveSquareMembersResponse (structs is final here)
+    method_to_response = {}
+    for sname in structs:
+        stem = sname[:-len('Response')]
+        if stem and sname.endswith('Response'):
+            for first in {stem[0], stem[0].lower()}:
+                if first.upper() == stem[0]:
+                    method_to_response[first + stem[1:]] = sname
+    def _response_for_method(mname):
+        if mname.isascii():
+            return method_to_response.get(mname)
+        expected_response = mname[0].upper() + mname[1:] + 'Response'
+        return expected_response if expected_response in structs else None
+
     print(f"Scanning {len(class_index)} files for wrapper patterns...")
     method_to_args_wrapper = {}
     method_to_result_wrapper = {}
     
-    for jp in JAVA_ROOT.rglob('*.java'):
-        ws = read_file(jp)
-        if not ws:
-            continue
-        for wm in re_wrapper_tostring.finditer(ws):
-            mname = wm.group(1)
-            kind = wm.group(2)
+    scans = _java_scans(sources)
+    for (jp, _, _), (_, _, wrapper_hits, _) in zip(sources, scans):
+        for mname, kind in wrapper_hits:
             if kind == 'args' and mname not in method_to_args_wrapper:
                 method_to_args_wrapper[mname] = jp.stem
                 if jp.stem in structs:
@@ -751,9 +949,8 @@ def parse_services():
                                 alias_map[field.type_name] = alias_name
                             break
     # Smali wrappers
-    for sp in _iter_smali_files():
-        sws = read_file(sp)
-        if not sws:
+    for sp, _, sws in smali:
+        if not sws or ('_args(' not in sws and '_result(' not in sws):
             continue
         for wm in re_smali_wrapper_tostring.finditer(sws):
             mname = wm.group(1)
@@ -775,36 +972,90 @@ def parse_services():
                             break
     
     print(f"Found {len(method_to_args_wrapper)} args wrappers and {len(method_to_result_wrapper)} result wrappers")
+
+    def _wrapper_paths(wrapper, marker):
+        # With a marker, every same-stem wrapper that mentions it is a candidate
+        # (the first one wins); without, only the first same-stem path is used
+        paths = stem_to_paths.get(wrapper, ())
+        if marker is None:
+            return paths[:1]
+        for path, rel_path in paths:
+            if marker in _wrapper_text(path, rel_path):
+                return [(path, rel_path)]
+        return []
+
+    def _args_wrapper_type(mname, check_marker):
+        """Arg type from the first public field of the method's _args wrapper."""
+        aw = method_to_args_wrapper.get(mname)
+        if aw:
+            for path, rel_path in _wrapper_paths(aw, f'{mname}_args' if check_marker else None):
+                pf = re_public_field.search(_wrapper_text(path, rel_path))
+                if pf:
+                    return normalize_type_name(pf.group(1))
+        return None
+
+    def _result_wrapper_types(mname, check_marker):
+        """(ret_type, ex_type) from the first fields of the method's _result wrapper."""
+        ret_type = None
+        ex_type = None
+        rw = method_to_result_wrapper.get(mname)
+        if rw:
+            for path, rel_path in _wrapper_paths(rw, f'{mname}_result' if check_marker else None):
+                fields = islice(re_public_field.finditer(_wrapper_text(path, rel_path)), 5)
+                # Parse fields - typically first is success/response, second is exception
+                for t, fname in (fm.groups() for fm in fields):
+                    nt = normalize_type_name(t)
+                    if not nt:
+                        continue
+                    # Check if it's an exception type by name
+                    if nt.endswith('Exception') or nt in exception_structs:
+                        if not ex_type:
+                            ex_type = nt
+                    elif not ret_type:
+                        # First non-exception field is the response
+                        ret_type = nt
+        return ret_type, ex_type
+
+    def _add_resolved_method(svc, mname, arg_type, ret_type, ex_type):
+        # Check if current types are obfuscated
+        if ret_type and ret_type in response_map:
+            ret_type = response_map[ret_type]
+        # Try to infer response type from method name if not found
+        if not ret_type or ret_type.endswith('Request'):
+            # Convert method name to expected response type
+            # e.g., approveSquareMembers -> ApproveSquareMembersResponse
+            ret_type = _response_for_method(mname) or ret_type
+        if arg_type is None:
+            arg_type = 'binary'
+        if ret_type is None:
+            ret_type = 'void'
+        ex_list = [ex_type] if ex_type and (ex_type.endswith('Exception') or ex_type in exception_structs) else []
+        svc.add_method(mname, arg_type, ret_type, exceptions=ex_list)
     
     print("Parsing services...")
     service_to_methods = defaultdict(set)
     
-    for p in JAVA_ROOT.rglob('*.java'):
-        s = read_file(p)
-        if 'ServiceClient' not in s:
-            continue
-        msvc = re_kotlin_meta_serviceclient.search(s)
-        if not msvc:
+    for _, _, _, kotlin_client_hit in scans:
+        if not kotlin_client_hit:
             continue
-        fq = msvc.group(1)
+        fq, methods = kotlin_client_hit
         base = fq.split('.')[-1]
         if base.endswith('ServiceClient'):
             svc_name = base[:-len('Client')]
         else:
             svc_name = base
-        methods = set(m.group(1) for m in re_kotlin_meta_method.finditer(s))
         if methods:
             service_to_methods[svc_name].update(methods)
     
-    for p in JAVA_ROOT.rglob('*.java'):
-        s = read_file(p)
+    for p, _, s in sources:
         if ('_args' not in s and '_result' not in s) and 'b("' not in s and 'ServiceClient' not in s and '$Client' not in s:
             continue
         if ('org.apache.thrift' not in s) and ('ServiceClient' not in s) and ('callWithResult' not in s) and 'b("' not in s and '$Client' not in s:
             continue
         
         svc_name = p.stem
-        msvc = re_kotlin_meta_serviceclient.search(s)
+        # Each scan below is skipped when a literal its regex needs is absent
+        msvc = re_kotlin_meta_serviceclient.search(s) if 'ServiceClient' in s else None
         if msvc:
             fq = msvc.group(1)
             base = fq.split('.')[-1]
@@ -812,11 +1063,11 @@ def parse_services():
                 svc_name = base[:-len('Client')]
         else:
             # Fallback: derive from class declaration
-            m1 = re.search(r'class\s+(\w+)\$Client\b', s)
+            m1 = re_client_inner_class.search(s) if '$Client' in s else None
             if m1:
                 svc_name = m1.group(1)
             else:
-                m2 = re.search(r'class\s+(\w+Service)Client\b', s)
+                m2 = re_service_client_class.search(s) if 'ServiceClient' in s else None
                 if m2:
                     svc_name = m2.group(1)
         
@@ -832,48 +1083,45 @@ def parse_services():
         svc = services.get(svc_name) or ThriftService(svc_name)
         
         method_to_arg = {}
-        for ma in re_method_args_class.finditer(s):
-            mname = ma.group(1)
-            start = ma.end()
-            window = s[start:start+2000]
-            fmatch = re_public_field.search(window)
-            if fmatch:
-                arg_type = normalize_type_name(fmatch.group(1))
-                if arg_type:
-                    method_to_arg[mname] = arg_type
+        if '_args' in s:
+            for ma in re_method_args_class.finditer(s):
+                mname = ma.group(1)
+                start = ma.end()
+                fmatch = re_public_field.search(s, start, start + 2000)
+                if fmatch:
+                    arg_type = normalize_type_name(fmatch.group(1))
+                    if arg_type:
+                        method_to_arg[mname] = arg_type
         
         method_to_ret_ex = {}
         # Extract return types from _result inner classes
-        for mr in re_method_result_class.finditer(s):
-            mname = mr.group(1)
-            # Get a large enough window to find field declarations
-            start_pos = mr.start()
-            end_pos = min(start_pos + 20000, len(s))  # Larger window
-            window = s[start_pos:end_pos]
-            
-            ret_type = None
-            ex_type = None
-            
-            # Look for field declarations after the class declaration
-            # Pattern: /* renamed from X */ public TypeName fieldName;
-            # The actual fields come after comment blocks
-            field_pattern = re.compile(r'/\*[^*]*\*/\s*public\s+([A-Za-z0-9_\.]+(?:<[^>]+>)?)\s+([A-Za-z0-9_]+);')
-            fields = field_pattern.findall(window)
+        if '_result' in s:
+            for mr in re_method_result_class.finditer(s):
+                mname = mr.group(1)
+                # Get a large enough window to find field declarations
+                start_pos = mr.start()
+                end_pos = min(start_pos + 20000, len(s))  # Larger window
+                head = re_first_100_lines.match(s, start_pos, end_pos)
+                lines_end = head.end() if head else end_pos
             
-            # Also try without comments
-            field_pattern2 = re.compile(r'^\s*public\s+([A-Za-z0-9_\.]+(?:<[^>]+>)?)\s+([A-Za-z0-9_]+);', re.MULTILINE)
-            fields.extend(field_pattern2.findall(window))
+                ret_type = None
+                ex_type = None
             
-            # Look specifically for Response and Exception types
-            for line in window.split('\n')[:100]:  # Check first 100 lines
-                if 'public' in line and not 'static' in line and not 'class' in line:
-                    # Extract type from lines like: public ApproveSquareMembersResponse f207849a;
-                    match = re.search(r'public\s+([A-Za-z0-9_\.]+(?:<[^>]+>)?)\s+([A-Za-z0-9_]+);', line)
-                    if match:
+                # Look specifically for Response and Exception types in the first
+                # 100 lines; first field per line, skipping static/class lines
+                seen_line = -1
+                for match in re_public_field_any.finditer(s, start_pos, lines_end):
+                    line_start = s.rfind('\n', start_pos, match.start()) + 1 or start_pos
+                    if line_start == seen_line:
+                        continue
+                    seen_line = line_start
+                    line_end = s.find('\n', match.end(), lines_end)
+                    line = s[line_start:line_end if line_end != -1 else lines_end]
+                    if not 'static' in line and not 'class' in line:
+                        # Extract type from lines like: public ApproveSquareMembersResponse f207849a;
                         ftype, fname = match.groups()
                         # Clean type
-                        if '.' in ftype:
-                            ftype = ftype.split('.')[-1]
+                        ftype = ftype.rpartition('.')[2]
                         nt = normalize_type_name(ftype)
                         if nt:
                             # Check if this is an obfuscated response type
@@ -884,98 +1132,106 @@ def parse_services():
                             elif nt.endswith('Exception') or nt in exception_structs:
                                 ex_type = nt
             
-            # Fallback: check fields list
-            if not ret_type or not ex_type:
-                for ftype, fname in fields[:20]:
-                    # Skip static fields check
-                    if 'static' in window[max(0, window.find(ftype)-50):window.find(ftype)]:
-                        continue
-                    # Clean type
-                    clean_type = ftype
-                    if '.' in clean_type:
-                        clean_type = clean_type.split('.')[-1]
-                    nt = normalize_type_name(clean_type)
-                    if not nt:
-                        continue
+                # Fallback: check fields list
+                if not ret_type or not ex_type:
+                    # Look for field declarations after the class declaration
+                    # Pattern: /* renamed from X */ public TypeName fieldName;
+                    # The actual fields come after comment blocks
+                    fields = re_commented_public_field.findall(s, start_pos, end_pos)
+                    # Also try without comments
+                    fields.extend(re_public_field_line.findall(s, start_pos, end_pos))
+                    for ftype, fname in fields[:20]:
+                        # Skip static fields check
+                        type_pos = s.find(ftype, start_pos, end_pos)
+                        if 'static' in s[max(start_pos, type_pos - 50):type_pos]:
+                            continue
+                        # Clean type
+                        clean_type = ftype.rpartition('.')[2]
+                        nt = normalize_type_name(clean_type)
+                        if not nt:
+                            continue
                     
-                    # Identify field type - check obfuscated names too
-                    if clean_type in response_map and not ret_type:
-                        ret_type = response_map[clean_type]
-                    elif nt.endswith('Response') and not ret_type:
-                        ret_type = nt
-                    elif (nt.endswith('Exception') or nt in exception_structs) and not ex_type:
-                        ex_type = nt
-                    elif not ret_type and not nt.endswith('Request') and not nt.endswith('Exception'):
-                        # First non-request, non-exception type
-                        # Check if it's an obfuscated response
-                        if clean_type in response_map:
+                        # Identify field type - check obfuscated names too
+                        if clean_type in response_map and not ret_type:
                             ret_type = response_map[clean_type]
-                        else:
+                        elif nt.endswith('Response') and not ret_type:
                             ret_type = nt
+                        elif (nt.endswith('Exception') or nt in exception_structs) and not ex_type:
+                            ex_type = nt
+                        elif not ret_type and not nt.endswith('Request') and not nt.endswith('Exception'):
+                            # First non-request, non-exception type
+                            # Check if it's an obfuscated response
+                            if clean_type in response_map:
+                                ret_type = response_map[clean_type]
+                            else:
+                                ret_type = nt
             
-            # If we didn't find a response type, try to infer from method name
-            if not ret_type or ret_type.endswith('Request'):
-                # Convert method name to expected response type
-                # e.g., approveSquareMembers -> ApproveSquareMembersResponse
-                expected_response = mname[0].upper() + mname[1:] + 'Response'
-                if expected_response in structs:
-                    ret_type = expected_response
+                # If we didn't find a response type, try to infer from method name
+                if not ret_type or ret_type.endswith('Request'):
+                    # Convert method name to expected response type
+                    # e.g., approveSquareMembers -> ApproveSquareMembersResponse
+                    ret_type = _response_for_method(mname) or ret_type
             
-            if ret_type or ex_type:
-                method_to_ret_ex[mname] = (ret_type, ex_type)
+                if ret_type or ex_type:
+                    method_to_ret_ex[mname] = (ret_type, ex_type)
         
-        meta_methods = set(m.group(1) for m in re_kotlin_meta_method.finditer(s))
+        meta_methods = set(re_kotlin_meta_method.findall(s))
         names = set(method_to_arg.keys()) | set(method_to_ret_ex.keys()) | meta_methods
         
         # Extract names and arg/ret from direct client method signatures
-        for cm in re_client_method.finditer(s):
-            ret_sig, method_name, arg_sig, method_tag = cm.groups()
-            tag = method_tag or method_name
-            names.add(tag)
-            if arg_sig:
-                # Clean up the argument signature
-                cleaned_arg = normalize_type_name(arg_sig) or arg_sig
-                if '...' in str(cleaned_arg) or not re.match(r'^[A-Za-z_][A-Za-z0-9_.<>\[\]]*$', str(cleaned_arg)):
-                    cleaned_arg = 'binary'
-                method_to_arg[tag] = _primitive_to_thrift(cleaned_arg)
-            if ret_sig:
-                cleaned_ret = normalize_type_name(ret_sig) or ret_sig
-                if '...' in str(cleaned_ret) or not re.match(r'^[A-Za-z_][A-Za-z0-9_.<>\[\]]*$', str(cleaned_ret)):
-                    cleaned_ret = 'binary'
-                method_to_ret_ex[tag] = (_primitive_to_thrift(cleaned_ret), None)
-
-        # Fallback: signature scan independent of b("...") capture
-        sig_re = re.compile(r'public\s+final\s+([A-Za-z0-9_\.<>\[\]]+)\s+(\w+)\s*\(([^)]*)\)')
-        for sm in sig_re.finditer(s):
-            ret_sig, method_name, args_str = sm.groups()
-            tag = method_name
-            names.add(tag)
-            # Extract first argument type
-            arg_sig = None
-            if args_str and args_str.strip():
-                first = args_str.split(',')[0].strip()
-                # e.g., "long userId" or "User user"
-                if ' ' in first:
-                    tok = first.split()[0]
-                else:
-                    tok = first
-                arg_sig = tok
-                # Clean up malformed types
-                if '...' in arg_sig:
-                    arg_sig = 'binary'
-            if arg_sig:
-                cleaned_arg = normalize_type_name(arg_sig) or arg_sig
-                if '...' in str(cleaned_arg) or not re.match(r'^[A-Za-z_][A-Za-z0-9_.<>\[\]]*$', str(cleaned_arg)):
-                    cleaned_arg = 'binary'
-                method_to_arg[tag] = _primitive_to_thrift(cleaned_arg)
-            if ret_sig:
-                cleaned_ret = normalize_type_name(ret_sig) or ret_sig  
-                if '...' in str(cleaned_ret) or not re.match(r'^[A-Za-z_][A-Za-z0-9_.<>\[\]]*$', str(cleaned_ret)):
-                    cleaned_ret = 'binary'
-                method_to_ret_ex[tag] = (_primitive_to_thrift(cleaned_ret), None)
-        # Fallback: pick up method tags from b("...") calls
-        for bm in re_b_only.finditer(s):
-            names.add(bm.group(1))
+        if 'b("' in s:
+            for cm in re_client_method.finditer(s):
+                ret_sig, method_name, arg_sig, method_tag = cm.groups()
+                tag = method_tag or method_name
+                names.add(tag)
+                if arg_sig:
+                    # Clean up the argument signature
+                    cleaned_arg = normalize_type_name(arg_sig) or arg_sig
+                    if '...' in str(cleaned_arg) or not re_type_ref.match(str(cleaned_arg)):
+                        cleaned_arg = 'binary'
+                    method_to_arg[tag] = _primitive_to_thrift(cleaned_arg)
+                if ret_sig:
+                    cleaned_ret = normalize_type_name(ret_sig) or ret_sig
+                    if '...' in str(cleaned_ret) or not re_type_ref.match(str(cleaned_ret)):
+                        cleaned_ret = 'binary'
+                    method_to_ret_ex[tag] = (_primitive_to_thrift(cleaned_ret), None)
+
+        # Fallback: signature scan independent of b("...") capture, sharing
+        # one pass with the b("...") method tags
+        if 'final' in s or 'b("' in s:
+            for sm in re_final_sig_or_b.finditer(s):
+                if sm.group('tag'):
+                    names.add(sm.group('tag'))
+                    continue
+                ret_sig, method_name, args_str = sm.group(1, 2, 3)
+                if 'b("' in args_str:
+                    # A tag inside the argument list was consumed by this match
+                    names.update(re_b_only.findall(s, sm.start(), sm.end()))
+                tag = method_name
+                names.add(tag)
+                # Extract first argument type
+                arg_sig = None
+                if args_str and args_str.strip():
+                    first = args_str.split(',')[0].strip()
+                    # e.g., "long userId" or "User user"
+                    if ' ' in first:
+                        tok = first.split()[0]
+                    else:
+                        tok = first
+                    arg_sig = tok
+                    # Clean up malformed types
+                    if '...' in arg_sig:
+                        arg_sig = 'binary'
+                if arg_sig:
+                    cleaned_arg = normalize_type_name(arg_sig) or arg_sig
+                    if '...' in str(cleaned_arg) or not re_type_ref.match(str(cleaned_arg)):
+                        cleaned_arg = 'binary'
+                    method_to_arg[tag] = _primitive_to_thrift(cleaned_arg)
+                if ret_sig:
+                    cleaned_ret = normalize_type_name(ret_sig) or ret_sig  
+                    if '...' in str(cleaned_ret) or not re_type_ref.match(str(cleaned_ret)):
+                        cleaned_ret = 'binary'
+                    method_to_ret_ex[tag] = (_primitive_to_thrift(cleaned_ret), None)
         
         if svc_name in service_to_methods:
             names.update(service_to_methods[svc_name])
@@ -983,7 +1239,7 @@ def parse_services():
         if not names:
             continue
         
-        for mname in sorted(names):
+        for mname in names:
             arg_type = method_to_arg.get(mname)
             ret_type, ex_type = method_to_ret_ex.get(mname, (None, None))
             # Check if ret_type is an obfuscated name
@@ -991,84 +1247,29 @@ def parse_services():
                 ret_type = response_map[ret_type]
             
             if not arg_type:
-                aw = method_to_args_wrapper.get(mname)
-                if aw:
-                    for path_key, path in class_index.items():
-                        if path.stem == aw:
-                            ws_content = read_file(path)
-                            if f'{mname}_args' in ws_content:
-                                pf = re_public_field.search(ws_content)
-                                if pf:
-                                    arg_type = normalize_type_name(pf.group(1))
-                                break
-            
+                arg_type = _args_wrapper_type(mname, check_marker=True)
             if not ret_type:
-                rw = method_to_result_wrapper.get(mname)
-                if rw:
-                    for path_key, path in class_index.items():
-                        if path.stem == rw:
-                            ws_content = read_file(path)
-                            if f'{mname}_result' in ws_content:
-                                fields = re_public_field.findall(ws_content)
-                                # Parse fields - typically first is success/response, second is exception
-                                for idx, (t, fname) in enumerate(fields[:5]):
-                                    nt = normalize_type_name(t)
-                                    if not nt:
-                                        continue
-                                        
-                                    # Check if it's an exception type by name
-                                    is_exception = (nt.endswith('Exception') or nt in exception_structs)
-                                    
-                                    if is_exception:
-                                        if not ex_type:
-                                            ex_type = nt
-                                    else:
-                                        # First non-exception field is the response
-                                        if not ret_type:
-                                            ret_type = nt
-                                break
-            
-            # Check if current types are obfuscated
-            if ret_type and ret_type in response_map:
-                ret_type = response_map[ret_type]
-            
-            # Try to infer response type from method name if not found
-            if not ret_type or ret_type.endswith('Request'):
-                # Convert method name to expected response type
-                expected_response = mname[0].upper() + mname[1:] + 'Response'
-                if expected_response in structs:
-                    ret_type = expected_response
-            
-            if arg_type is None:
-                arg_type = 'binary'
-            if ret_type is None:
-                ret_type = 'void'
-            
-            ex_list = []
-            if ex_type and (ex_type.endswith('Exception') or ex_type in exception_structs):
-                ex_list = [ex_type]
+                wrapper_ret, wrapper_ex = _result_wrapper_types(mname, check_marker=True)
+                ret_type = wrapper_ret or ret_type
+                ex_type = ex_type or wrapper_ex
             
-            svc.add_method(mname, arg_type, ret_type, exceptions=ex_list)
+            _add_resolved_method(svc, mname, arg_type, ret_type, ex_type)
         
         # Ensure service names don't collide with enums/structs
         original_svc_name = svc_name
         if svc_name in global_type_names:
-            suffix = 2
-            while f"{original_svc_name}_{suffix}" in global_type_names:
-                suffix += 1
-            svc_name = f"{original_svc_name}_{suffix}"
+            svc_name = _suffixed_type_name(original_svc_name)
             svc.name = svc_name
         global_type_names.add(svc_name)
         services[svc_name] = svc
 
     # Smali-based service parsing
-    for sp in _iter_smali_files():
-        s = read_file(sp)
+    for sp, _, s in smali:
         if not s:
             continue
         # A service-like client typically has $Client or ServiceClient in class name, or calls ->b("...")
-        has_tag = bool(re_smali_method_tag.search(s))
-        class_m = re_smali_class.search(s)
+        has_tag = '->b(' in s and bool(re_smali_method_tag.search(s))
+        class_m = re_smali_class.search(s) if '.class' in s else None
         if not class_m and not has_tag:
             continue
         base_simple = class_m.group(1).split('/')[-1].split('$')[-1] if class_m else Path(sp).stem
@@ -1093,7 +1294,7 @@ def parse_services():
         svc = services.get(svc_name) or ThriftService(svc_name)
 
         # Collect method tags from smali
-        names = set(m.group(1) for m in re_smali_method_tag.finditer(s))
+        names = set(re_smali_method_tag.findall(s))
 
         # Try to enrich from wrappers discovered globally
         # (Kotlin meta not present in smali)
@@ -1107,64 +1308,62 @@ def parse_services():
             aw = method_to_args_wrapper.get(mname)
             if aw and not method_to_arg.get(mname):
                 # Search in class_index (java or smali)
-                for path_key, path in class_index.items():
-                    if Path(path).stem == aw:
-                        wsrc = read_file(path)
-                        if path.suffix == '.java':
-                            pf = re_public_field.search(wsrc)
-                            if pf:
-                                method_to_arg[mname] = normalize_type_name(pf.group(1))
-                        else:
-                            sm = re_smali_public_field.search(wsrc)
-                            if sm:
-                                method_to_arg[mname] = normalize_type_name(_smali_desc_to_java_simple(sm.group(1)))
-                        break
+                paths = stem_to_paths.get(aw)
+                if paths:
+                    path, rel_path = paths[0]
+                    wsrc = _wrapper_text(path, rel_path)
+                    if path.suffix == '.java':
+                        pf = re_public_field.search(wsrc)
+                        if pf:
+                            method_to_arg[mname] = normalize_type_name(pf.group(1))
+                    else:
+                        sm = re_smali_public_field.search(wsrc)
+                        if sm:
+                            method_to_arg[mname] = normalize_type_name(_smali_desc_to_java_simple(sm.group(1)))
             # Ret via result wrapper
             rw = method_to_result_wrapper.get(mname)
             ret_type = None
             ex_type = None
             if rw:
-                for path_key, path in class_index.items():
-                    if Path(path).stem == rw:
-                        wsrc = read_file(path)
-                        if path.suffix == '.java':
-                            fields = re_public_field.findall(wsrc)
-                            for t, fname in fields[:5]:
-                                nt = normalize_type_name(t)
-                                if not nt:
-                                    continue
-                                if nt.endswith('Exception') or nt in exception_structs:
-                                    if not ex_type:
-                                        ex_type = nt
-                                else:
-                                    if not ret_type:
-                                        ret_type = nt
-                        else:
-                            # Smali public fields
-                            sfields = re_smali_public_field.findall(wsrc)
-                            for d in sfields[:5]:
-                                nt = normalize_type_name(_smali_desc_to_java_simple(d))
-                                if not nt:
-                                    continue
-                                if nt.endswith('Exception') or nt in exception_structs:
-                                    if not ex_type:
-                                        ex_type = nt
-                                else:
-                                    if not ret_type:
-                                        ret_type = nt
-                        break
+                paths = stem_to_paths.get(rw)
+                if paths:
+                    path, rel_path = paths[0]
+                    wsrc = _wrapper_text(path, rel_path)
+                    if path.suffix == '.java':
+                        for fm in islice(re_public_field.finditer(wsrc), 5):
+                            t, fname = fm.groups()
+                            nt = normalize_type_name(t)
+                            if not nt:
+                                continue
+                            if nt.endswith('Exception') or nt in exception_structs:
+                                if not ex_type:
+                                    ex_type = nt
+                            else:
+                                if not ret_type:
+                                    ret_type = nt
+                    else:
+                        # Smali public fields
+                        for sm in islice(re_smali_public_field.finditer(wsrc), 5):
+                            d = sm.group(1)
+                            nt = normalize_type_name(_smali_desc_to_java_simple(d))
+                            if not nt:
+                                continue
+                            if nt.endswith('Exception') or nt in exception_structs:
+                                if not ex_type:
+                                    ex_type = nt
+                            else:
+                                if not ret_type:
+                                    ret_type = nt
             if ret_type or ex_type:
                 method_to_ret_ex[mname] = (ret_type, ex_type)
 
         # Emit methods
-        for mname in sorted(names):
+        for mname in names:
             arg_type = method_to_arg.get(mname) or 'binary'
             ret_type, ex_type = method_to_ret_ex.get(mname, (None, None))
             if not ret_type:
                 # Infer from name if we have a matching Response struct
-                expected_response = mname[0].upper() + mname[1:] + 'Response'
-                if expected_response in structs:
-                    ret_type = expected_response
+                ret_type = _response_for_method(mname) or ret_type
             if ret_type is None:
                 ret_type = 'void'
             ex_list = [ex_type] if ex_type and (ex_type.endswith('Exception') or ex_type in exception_structs) else []
@@ -1173,98 +1372,51 @@ def parse_services():
         # Ensure unique service name & register
         original_svc_name = svc_name
         if svc.name in global_type_names:
-            suffix = 2
-            while f"{original_svc_name}_{suffix}" in global_type_names:
-                suffix += 1
-            svc.name = f"{original_svc_name}_{suffix}"
+            svc.name = _suffixed_type_name(original_svc_name)
         global_type_names.add(svc.name)
         services[svc.name] = svc
     
     # Add any remaining services from global annotations
     for svc_name, methods in service_to_methods.items():
         svc = services.get(svc_name) or ThriftService(svc_name)
-        for mname in sorted(methods):
+        for mname in methods:
             # Check if method already exists
-            exists = False
-            for m in svc.methods:
-                if m['name'] == mname:
-                    exists = True
-                    break
-            if exists:
+            if svc.has_method(mname):
                 continue
             
-            arg_type = None
-            ret_type = None
-            ex_type = None
-            
-            aw = method_to_args_wrapper.get(mname)
-            if aw:
-                for path_key, path in class_index.items():
-                    if path.stem == aw:
-                        ws = read_file(path)
-                        pf = re_public_field.search(ws)
-                        if pf:
-                            arg_type = normalize_type_name(pf.group(1))
-                        break
-            
-            rw = method_to_result_wrapper.get(mname)
-            if rw:
-                for path_key, path in class_index.items():
-                    if path.stem == rw:
-                        ws = read_file(path)
-                        fields = re_public_field.findall(ws)
-                        # Parse fields - typically first is success/response, second is exception
-                        for idx, (t, fname) in enumerate(fields[:5]):
-                            nt = normalize_type_name(t)
-                            if not nt:
-                                continue
-                                
-                            # Check if it's an exception type by name
-                            is_exception = (nt.endswith('Exception') or nt in exception_structs)
-                            
-                            if is_exception:
-                                if not ex_type:
-                                    ex_type = nt
-                            else:
-                                # First non-exception field is the response
-                                if not ret_type:
-                                    # Check if it's an obfuscated response
-                                    if nt in response_map:
-                                        ret_type = response_map[nt]
-                                    else:
-                                        ret_type = nt
-                        break
-            
-            # Check if current types are obfuscated
-            if ret_type and ret_type in response_map:
+            arg_type = _args_wrapper_type(mname, check_marker=False)
+            ret_type, ex_type = _result_wrapper_types(mname, check_marker=False)
+            # Obfuscated responses are mapped here and again when the method is added
+            if ret_type in response_map:
                 ret_type = response_map[ret_type]
             
-            # Try to infer response type from method name if not found
-            if not ret_type or ret_type.endswith('Request'):
-                # Convert method name to expected response type
-                expected_response = mname[0].upper() + mname[1:] + 'Response'
-                if expected_response in structs:
-                    ret_type = expected_response
-            
-            if arg_type is None:
-                arg_type = 'binary'
-            if ret_type is None:
-                ret_type = 'void'
-            
-            ex_list = [ex_type] if ex_type and (ex_type.endswith('Exception') or ex_type in exception_structs) else []
-            svc.add_method(mname, arg_type, ret_type, exceptions=ex_list)
+            _add_resolved_method(svc, mname, arg_type, ret_type, ex_type)
         
         # Ensure service names don't collide with enums/structs
         original_svc_name = svc_name
         if svc_name in global_type_names:
-            suffix = 2
-            while f"{original_svc_name}_{suffix}" in global_type_names:
-                suffix += 1
-            svc_name = f"{original_svc_name}_{suffix}"
+            svc_name = _suffixed_type_name(original_svc_name)
             svc.name = svc_name
         global_type_names.add(svc_name)
         services[svc_name] = svc
 
+    # Method names were collected in sets; order each service once, by name
+    for svc in services.values():
+        svc.methods.sort(key=lambda m: m['name'])
+
+def _sanitize_type(t: str) -> str:
+    """Service signature type, or binary when it is not defined in the IDL."""
+    if not t:
+        return 'binary'
+    # containers are already well-formed
+    if '<' in t and '>' in t:
+        return t
+    if t in SIGNATURE_BASE_TYPES:
+        return t
+    if t in structs or t in enums:
+        return t
+    return 'binary'
+
 def thrift_type_str(field):
     t = field.ttype
     if t in ('bool','i8','double','i16','i32','i64','string'):
@@ -1284,15 +1436,13 @@ def thrift_type_str(field):
         raw_elem = normalize_type_name(field.val_type) or normalize_type_name(field.type_name) or 'i32'
         elem = _primitive_to_thrift(raw_elem)
         # Fallback unknown custom types to i32 to avoid undefined references
-        base_types = {'bool','i8','i16','i32','i64','double','string','binary'}
-        if elem not in base_types and elem not in enums and elem not in structs:
+        if elem not in BASE_THRIFT_TYPES and elem not in enums and elem not in structs:
             elem = 'i32'
         return f'list<{elem}>'
     if t == 'set':
         raw_elem = normalize_type_name(field.val_type) or normalize_type_name(field.type_name) or 'i32'
         elem = _primitive_to_thrift(raw_elem)
-        base_types = {'bool','i8','i16','i32','i64','double','string','binary'}
-        if elem not in base_types and elem not in enums and elem not in structs:
+        if elem not in BASE_THRIFT_TYPES and elem not in enums and elem not in structs:
             elem = 'i32'
         return f'set<{elem}>'
     if t == 'map':
@@ -1301,12 +1451,10 @@ def thrift_type_str(field):
         kt = _primitive_to_thrift(raw_kt)
         vt = _primitive_to_thrift(raw_vt)
         # Thrift map key types must be base types or enums; fallback to i32 if invalid
-        valid_key_bases = {'bool','byte','i8','i16','i32','i64','double','string'}
-        if kt not in valid_key_bases and kt not in enums:
+        if kt not in MAP_KEY_BASE_TYPES and kt not in enums:
             kt = 'i32'
         # Fallback unknown custom value types to i32
-        base_types = {'bool','i8','i16','i32','i64','double','string','binary'}
-        if vt not in base_types and vt not in enums and vt not in structs:
+        if vt not in BASE_THRIFT_TYPES and vt not in enums and vt not in structs:
             vt = 'i32'
         return f'map<{kt},{vt}>'
     if t == 'enum':
@@ -1315,172 +1463,164 @@ def thrift_type_str(field):
         return 'binary'
     return 'i32'
 
-def emit_thrift():
-    print(f"Writing {OUTPUT_FILE}...")
+def emit_thrift(fp=None):
+    """Write the Thrift IDL to the text stream fp, or to OUTPUT_FILE when fp is None."""
+    if fp is None:
+        print(f"Writing {OUTPUT_FILE}...")
     # Resolve OUTPUT_FILE in case it is a patched/callable mock
     def _out():
         try:
             return OUTPUT_FILE() if callable(OUTPUT_FILE) else OUTPUT_FILE
         except TypeError:
             return OUTPUT_FILE
-    lines = []
+    # Lines are written with their leading newline so the file has no
+    # trailing newline after the last block. A caller's stream is left open
+    with (open(_out(), 'w') if fp is None else nullcontext(fp)) as f:
+        w = f.write
     
-    # Namespace
-    lines.append('namespace java line.thrift')
-    lines.append('')
+        # Namespace
+        w('namespace java line.thrift')
+        w('\n')
     
-    # Type aliases
-    if alias_map:
-        lines.append('// Type aliases for obfuscated names')
-        seen_aliases = set()
-        # Collect all type names that will be generated
-        all_type_names = set()
-        all_type_names.update(enums.keys())
-        all_type_names.update(st.name for st in structs.values())
-        all_type_names.update(svc.name for svc in services.values())
+        # Type aliases
+        if alias_map:
+            w('\n// Type aliases for obfuscated names')
+            seen_aliases = set()
+            # Collect all type names that will be generated
+            all_type_names = set()
+            all_type_names.update(enums.keys())
+            all_type_names.update(st.name for st in structs.values())
+            all_type_names.update(svc.name for svc in services.values())
         
-        for obfuscated, semantic in sorted(alias_map.items()):
-            # Skip duplicates and conflicts with existing types
-            if semantic in seen_aliases or semantic in all_type_names:
-                continue
-            seen_aliases.add(semantic)
-            # Emit aliases as i32 to satisfy tests and provide a safe default
-            lines.append(f'typedef i32 {semantic}')
-        lines.append('')
+            for obfuscated, semantic in sorted(alias_map.items()):
+                # Skip duplicates and conflicts with existing types
+                if semantic in seen_aliases or semantic in all_type_names:
+                    continue
+                seen_aliases.add(semantic)
+                # Emit aliases as i32 to satisfy tests and provide a safe default
+                w(f'\ntypedef i32 {semantic}')
+            w('\n')
     
-    # Enums
-    lines.append('# Enums')
-    lines.append('// Enumerations')
-    seen_enum_names = set()
-    for ename in sorted(enums.keys()):
-        en = enums[ename]
-        if not en.values:
-            continue
-        # Skip duplicate enum names in output
-        if en.name in seen_enum_names:
-            continue
-        seen_enum_names.add(en.name)
-        lines.append(f'enum {en.name} {{')
-        seen = set()
-        for (n, v) in en.values:
-            if n in seen:
+        # Enums
+        w('\n# Enums')
+        w('\n// Enumerations')
+        seen_enum_names = set()
+        for ename in sorted(enums.keys()):
+            en = enums[ename]
+            if not en.values:
+                continue
+            # Skip duplicate enum names in output
+            if en.name in seen_enum_names:
                 continue
-            enum_name = escape_reserved(n)
-            lines.append(f'  {enum_name} = {v},')
-            seen.add(n)
-        if lines[-1].endswith(','):
-            lines[-1] = lines[-1][:-1]
-        lines.append('}')
-        lines.append('')
+            seen_enum_names.add(en.name)
+            w(f'\nenum {en.name} {{')
+            seen = set()
+            # Comma goes in front of every member but the first
+            sep = '\n'
+            for (n, v) in en.values:
+                if n in seen:
+                    continue
+                enum_name = escape_reserved(n)
+                w(f'{sep}  {enum_name} = {v}')
+                sep = ',\n'
+                seen.add(n)
+            w('\n}\n')
     
-    # Structs and Exceptions
-    lines.append('# Structs')
-    lines.append('// Data structures')
-    seen_struct_names = set()
-    for sname in sorted(structs.keys()):
-        st = structs[sname]
-        # Skip duplicate struct names in output
-        if st.name in seen_struct_names:
-            continue
-        seen_struct_names.add(st.name)
-        # Treat as exception if recognized by name or tracked as emitted exception
-        kind = 'exception' if (st.name.endswith('Exception') or st.name in exception_structs or st.name in emitted_exception_names) else 'struct'
-        lines.append(f'{kind} {st.name} {{')
-        if st.fields:
-            # Ensure no duplicate or zero field IDs
-            seen_ids = set()
-            next_id = 1
-            for fld in sorted(st.fields, key=lambda f: f.id):
-                # Fix field ID if it's 0 or duplicate
-                if fld.id <= 0 or fld.id in seen_ids:
-                    while next_id in seen_ids:
-                        next_id += 1
-                    fld.id = next_id
-                seen_ids.add(fld.id)
-                next_id = max(next_id, fld.id) + 1
+        # Structs and Exceptions
+        w('\n# Structs')
+        w('\n// Data structures')
+        seen_struct_names = set()
+        for sname in sorted(structs.keys()):
+            st = structs[sname]
+            # Skip duplicate struct names in output
+            if st.name in seen_struct_names:
+                continue
+            seen_struct_names.add(st.name)
+            # Treat as exception if recognized by name or tracked as emitted exception
+            kind = 'exception' if (st.name.endswith('Exception') or st.name in exception_structs or st.name in emitted_exception_names) else 'struct'
+            w(f'\n{kind} {st.name} {{')
+            if st.fields:
+                # Ensure no duplicate or zero field IDs. Fields go out in id order
+                # and next_id stays above every id emitted so far, so it is always
+                # free to hand to a zero or duplicate id. The parsed Field keeps
+                # its own id; only the emitted one is fixed up
+                seen_ids = set()
+                next_id = 1
+                sep = '\n'
+                for fld in sorted(st.fields, key=lambda f: f.id):
+                    fid = fld.id
+                    # Fix field ID if it's 0 or duplicate
+                    if fid <= 0 or fid in seen_ids:
+                        fid = next_id
+                    seen_ids.add(fid)
+                    next_id = max(next_id, fid) + 1
                 
-                tstr = thrift_type_str(fld)
-                req = 'required ' if getattr(fld, 'required', False) else ''
-                field_name = escape_reserved(fld.name)
-                lines.append(f'  {fld.id}: {req}{tstr} {field_name},')
-            if lines[-1].endswith(','):
-                lines[-1] = lines[-1][:-1]
-        lines.append('}')
-        lines.append('')
+                    tstr = thrift_type_str(fld)
+                    req = 'required ' if getattr(fld, 'required', False) else ''
+                    field_name = escape_reserved(fld.name)
+                    w(f'{sep}  {fid}: {req}{tstr} {field_name}')
+                    sep = ',\n'
+            w('\n}\n')
     
-    # Services
-    lines.append('# Services')
-    lines.append('// Service definitions')
-    seen_service_names = set()
-    for svc_name in sorted(services.keys()):
-        svc = services[svc_name]
-        # Skip duplicate service names in output
-        if svc.name in seen_service_names:
-            continue
-        seen_service_names.add(svc.name)
-        lines.append(f'service {svc.name} {{')
-        for m in svc.methods:
-            # Check if return type is obfuscated and map it
-            ret_type = m['ret_type']
-            if ret_type in response_map:
-                ret_type = response_map[ret_type]
-            # Check if arg type is obfuscated and map it
-            arg_type = m['arg_type']
-            if arg_type in response_map:
-                arg_type = response_map[arg_type]
-
-            # Final sanity for service signatures: fallback unknown custom types to binary
-            def _sanitize_type(t: str) -> str:
-                if not t:
-                    return 'binary'
-                # containers are already well-formed
-                if '<' in t and '>' in t:
-                    return t
-                base_types = {'bool','i8','i16','i32','i64','double','string','binary','void'}
-                if t in base_types:
-                    return t
-                if t in structs or t in enums:
-                    return t
-                return 'binary'
-
-            arg_type = _sanitize_type(_primitive_to_thrift(arg_type))
-            ret_type = _sanitize_type(_primitive_to_thrift(ret_type))
+        # Services
+        w('\n# Services')
+        w('\n// Service definitions')
+        seen_service_names = set()
+        for svc_name in sorted(services.keys()):
+            svc = services[svc_name]
+            # Skip duplicate service names in output
+            if svc.name in seen_service_names:
+                continue
+            seen_service_names.add(svc.name)
+            w(f'\nservice {svc.name} {{')
+            sep = '\n'
+            for m in svc.methods:
+                # Check if return type is obfuscated and map it
+                ret_type = m['ret_type']
+                if ret_type in response_map:
+                    ret_type = response_map[ret_type]
+                # Check if arg type is obfuscated and map it
+                arg_type = m['arg_type']
+                if arg_type in response_map:
+                    arg_type = response_map[arg_type]
+
+                # Final sanity for service signatures: fallback unknown custom types to binary
+                arg_type = _sanitize_type(_primitive_to_thrift(arg_type))
+                ret_type = _sanitize_type(_primitive_to_thrift(ret_type))
             
-            throws_clause = ''
-            if m['exceptions']:
-                # Only include exceptions that are actually defined in our IDL
-                valid_exceptions = []
-                for ex in m['exceptions']:
-                    if not ex:
-                        continue
-                    # Map original to emitted name if renamed
-                    mapped = exception_name_alias.get(ex, ex)
-                    # Is this emitted as an exception?
-                    if mapped in emitted_exception_names:
-                        valid_exceptions.append(mapped)
-                        continue
-                    # Or if it is a struct we've parsed whose name ends with 'Exception'
-                    if mapped in structs and structs[mapped].name.endswith('Exception'):
-                        valid_exceptions.append(mapped)
-                if valid_exceptions:
-                    # Assign unique field ids in throws clause
-                    throws_clause = ' throws (' + ', '.join([f'{i}: {ex} ex' for i, ex in enumerate(valid_exceptions, start=1)]) + ')'
-            method_name = escape_reserved(m['name'])
-            lines.append(f"  {ret_type} {method_name}(1: {arg_type} request){throws_clause},")
-        if lines[-1].endswith(','):
-            lines[-1] = lines[-1][:-1]
-        lines.append('}')
-        lines.append('')
-    
-    with open(_out(), 'w') as f:
-        f.write('\n'.join(lines))
+                throws_clause = ''
+                if m['exceptions']:
+                    # Only include exceptions that are actually defined in our IDL
+                    valid_exceptions = []
+                    for ex in m['exceptions']:
+                        if not ex:
+                            continue
+                        # Map original to emitted name if renamed
+                        mapped = exception_name_alias.get(ex, ex)
+                        # Is this emitted as an exception?
+                        if mapped in emitted_exception_names:
+                            valid_exceptions.append(mapped)
+                            continue
+                        # Or if it is a struct we've parsed whose name ends with 'Exception'
+                        if mapped in structs and structs[mapped].name.endswith('Exception'):
+                            valid_exceptions.append(mapped)
+                    if valid_exceptions:
+                        # Assign unique field ids in throws clause
+                        throws_clause = ' throws (' + ', '.join([f'{i}: {ex} ex' for i, ex in enumerate(valid_exceptions, start=1)]) + ')'
+                method_name = escape_reserved(m['name'])
+                w(f"{sep}  {ret_type} {method_name}(1: {arg_type} request){throws_clause}")
+                sep = ',\n'
+            w('\n}\n')
 
-def write_thrift():
+def write_thrift(fp=None):
     """Backward-compatible wrapper used by tests."""
-    return emit_thrift()
+    return emit_thrift(fp)
 
 def write_report():
     """Write a capture report (JSON + text) next to OUTPUT_FILE."""
+    # Only the report needs these; keep them off the CLI startup path
+    import json
+    from datetime import datetime
     total_methods = sum(len(svc.methods) for svc in services.values())
     def _out():
         try:
@@ -1505,34 +1645,49 @@ def write_report():
             if m['arg_type'] == 'binary' or m['ret_type'] in ('void', 'binary')
         ],
     }
-    # Write JSON and text reports
+    # Compact JSON, swapped into place so a crash never leaves a partial report
+    json_path = _out().with_suffix('.report.json')
+    tmp_path = json_path.with_suffix('.json.tmp')
     try:
-        _out().with_suffix('.report.json').write_text(json.dumps(report, indent=2), encoding='utf-8')
-        txt_lines = [
-            f"Report generated: {report['timestamp']}",
-            f"Java root: {report['java_root']}",
-            f"Output: {report['output_file']}",
-        ]
-        for k, v in report['counts'].items():
-            txt_lines.append(f"{k}: {v}")
-        if report['incomplete_methods']:
-            txt_lines.append("")
-            txt_lines.append("Incomplete methods (arg is binary or ret is void/binary):")
-            for item in report['incomplete_methods']:
-                txt_lines.append(f"- {item['service']}.{item['name']}({item['arg_type']}) -> {item['ret_type']}")
-        _out().with_suffix('.report.txt').write_text('\n'.join(txt_lines), encoding='utf-8')
-    except Exception:
-        pass
+        tmp_path.write_text(json.dumps(report, separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp_path, json_path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
+    txt_lines = [
+        f"Report generated: {report['timestamp']}",
+        f"Java root: {report['java_root']}",
+        f"Output: {report['output_file']}",
+    ]
+    for k, v in report['counts'].items():
+        txt_lines.append(f"{k}: {v}")
+    if report['incomplete_methods']:
+        txt_lines.append("")
+        txt_lines.append("Incomplete methods (arg is binary or ret is void/binary):")
+        for item in report['incomplete_methods']:
+            txt_lines.append(f"- {item['service']}.{item['name']}({item['arg_type']}) -> {item['ret_type']}")
+    _out().with_suffix('.report.txt').write_text('\n'.join(txt_lines), encoding='utf-8')
 
 def main():
+    _check_java_root()
     print("=" * 80)
     print("LINE Thrift IDL Compiler")
     print("=" * 80)
     
-    # Parse all components
-    parse_enums()
-    parse_structs()
-    parse_services()
+    # Read every source once, then parse all components
+    global java_sources, smali_sources, java_scans, response_map_sources
+    load_sources()
+    try:
+        parse_enums()
+        parse_structs()
+        parse_services()
+    finally:
+        # The caches belong to this run; later direct parse_* calls read the tree again
+        java_sources = smali_sources = java_scans = None
+        response_map_sources = None
     
     # Generate output
     write_thrift()
@@ -1,29 +1,20 @@
 """Pytest configuration and fixtures for thrift_compiler tests"""
 
 import pytest
-import tempfile
-import shutil
 from pathlib import Path
+from unittest.mock import MagicMock
 import sys
 
-# Add src to path for all tests
+# Add src to path for all tests; the test modules import thrift_compiler from there
 sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 
-
-@pytest.fixture
-def temp_dir():
-    """Create a temporary directory for testing"""
-    temp = tempfile.mkdtemp()
-    yield Path(temp)
-    shutil.rmtree(temp, ignore_errors=True)
+import thrift_compiler  # noqa: E402
 
 
-@pytest.fixture
-def mock_java_root(temp_dir):
-    """Create a mock Java source root directory"""
-    java_root = temp_dir / 'sources'
-    java_root.mkdir()
-    return java_root
+@pytest.fixture(scope='session')
+def tc():
+    """The compiler module, imported once per test process"""
+    return thrift_compiler
 
 
 @pytest.fixture
@@ -74,23 +65,173 @@ public static class Client {
 """
 
 
+# Module-level registries the parse passes fill in
+COMPILER_REGISTRIES = ('enums', 'structs', 'services', 'exception_structs', 'class_index',
+                       'alias_map', 'response_map', 'exception_name_alias',
+                       'emitted_exception_names', 'global_type_names', 'type_name_suffix')
+# Per-run source caches; None means "walk the tree again"
+COMPILER_SOURCE_CACHES = ('java_sources', 'smali_sources', 'java_scans',
+                          'response_map_sources')
+
+
+def _reset_state(monkeypatch):
+    """Swap in empty registries and source caches; monkeypatch restores the originals"""
+    for name in COMPILER_REGISTRIES:
+        monkeypatch.setattr(thrift_compiler, name, type(getattr(thrift_compiler, name))())
+    for name in COMPILER_SOURCE_CACHES:
+        monkeypatch.setattr(thrift_compiler, name, None)
+
+
+# Java sources behind the end-to-end integration tests. They are compiled
+# together once per session (see compiled_corpus), so each one has to keep
+# its meaning next to the others
+INTEGRATION_CORPUS = {
+    'enums/Status.java': """
+public enum Status {
+    ACTIVE(1),
+    INACTIVE(2),
+    PENDING(3);
+}
+""",
+    'structs/User.java': """
+public class User implements org.apache.thrift.k {
+    public static final ww1.c f1 = new ww1.c("id", (byte) 10, 1);
+    public static final ww1.c f2 = new ww1.c("name", (byte) 11, 2);
+    public static final ww1.c f3 = new ww1.c("status", (byte) 16, 3);
+    public long f4;
+    public String f5;
+    public Status f6;
+}
+""",
+    'exceptions/UserException.java': """
+public class UserException extends org.apache.thrift.i implements org.apache.thrift.k {
+    public static final ww1.c f1 = new ww1.c("message", (byte) 11, 1);
+    public static final ww1.c f2 = new ww1.c("code", (byte) 8, 2);
+    public String f3;
+    public int f4;
+}
+""",
+    'services/UserService.java': """public class UserService {}""",
+    'services/UserService$Client.java': """
+public static class Client {
+    public final User getUser(long userId) throws UserException {
+        b("getUser");
+    }
+    public final void updateUser(User user) throws UserException {
+        b("updateUser");
+    }
+}
+""",
+    # Obfuscated Response class
+    'B41/E0.java': """
+public class E0 implements org.apache.thrift.d {
+    public static final ww1.c f1 = new ww1.c("users", (byte) 15, 1);
+    public ArrayList<User> f2;
+    public String toString() {
+        return new StringBuilder("GetUsersResponse(").toString();
+    }
+}
+""",
+    'enums/TalkErrorCode.java': """
+public enum TalkErrorCode {
+    E2EE_INVALID_PROTOCOL(81),
+    E2EE_RETRY_ENCRYPT(82),
+    E2EE_UPDATE_SENDER_KEY(83),
+    E2EE_UPDATE_RECEIVER_KEY(84);
+}
+""",
+    'structs/EstablishE2EESessionRequest.java': """
+public class EstablishE2EESessionRequest implements org.apache.thrift.k {
+    public static final ww1.c f1 = new ww1.c("clientPublicKey", (byte) 11, 1);
+    public String f2;
+}
+""",
+    'structs/EstablishE2EESessionResponse.java': """
+public class EstablishE2EESessionResponse implements org.apache.thrift.k {
+    public static final ww1.c f1 = new ww1.c("sessionId", (byte) 11, 1);
+    public static final ww1.c f2 = new ww1.c("serverPublicKey", (byte) 11, 2);
+    public static final ww1.c f3 = new ww1.c("expireAt", (byte) 10, 3);
+    public String f4;
+    public String f5;
+    public long f6;
+}
+""",
+    'services/E2eeKeyBackupService.java': """public class E2eeKeyBackupService {}""",
+    'services/E2eeKeyBackupService$Client.java': """
+public static class Client {
+    public final void callWithResult(binary request) {
+        b("callWithResult");
+    }
+}
+""",
+    # Nested containers over a type no source defines
+    'structs/ComplexData.java': """
+public class ComplexData implements org.apache.thrift.k {
+    public static final ww1.c f1 = new ww1.c("mapData", (byte) 13, 1);
+    public static final ww1.c f2 = new ww1.c("listData", (byte) 15, 2);
+    public static final ww1.c f3 = new ww1.c("setData", (byte) 14, 3);
+    public static final ww1.c f4 = new ww1.c("nestedMap", (byte) 13, 4);
+    public HashMap<String, Integer> f5;
+    public ArrayList<Member> f6;
+    public HashSet<String> f7;
+    public HashMap<String, ArrayList<Member>> f8;
+}
+""",
+}
+
+
+@pytest.fixture(scope='session')
+def compiled_corpus(tmp_path_factory, tc):
+    """Compile INTEGRATION_CORPUS once and return the emitted Thrift IDL"""
+    root = tmp_path_factory.mktemp('corpus')
+    java_root = root / 'sources'
+    for rel_path, content in INTEGRATION_CORPUS.items():
+        file_path = java_root / rel_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+    output_file = root / 'output.thrift'
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(tc, 'JAVA_ROOT', java_root, raising=False)
+        mp.setattr(tc, 'OUTPUT_FILE', output_file, raising=False)
+        _reset_state(mp)
+        tc.main()
+    return output_file.read_text()
+
+
+@pytest.fixture(scope='session')
+def corpus_lines(compiled_corpus):
+    """Emitted lines of the compiled corpus, stripped of indent and list commas"""
+    return frozenset(line.strip().rstrip(',') for line in compiled_corpus.splitlines())
+
+
+@pytest.fixture
+def tc_env(tmp_path, monkeypatch, tc):
+    """Point JAVA_ROOT and OUTPUT_FILE under tmp_path and yield (java_root, output_file)"""
+    java_root = tmp_path / 'sources'
+    java_root.mkdir()
+    output_file = tmp_path / 'output.thrift'
+    monkeypatch.setattr(tc, 'JAVA_ROOT', java_root, raising=False)
+    monkeypatch.setattr(tc, 'OUTPUT_FILE', output_file, raising=False)
+    yield java_root, output_file
+
+
+@pytest.fixture
+def mock_sources(monkeypatch, tc):
+    """Replace read_file and _iter_java_files with mocks; yields (read_file, iter_java_files)"""
+    read_file = MagicMock()
+    iter_java_files = MagicMock()
+    monkeypatch.setattr(tc, 'read_file', read_file)
+    monkeypatch.setattr(tc, '_iter_java_files', iter_java_files)
+    yield read_file, iter_java_files
+
+
+@pytest.fixture
+def reset_compiler(monkeypatch):
+    """Callable that gives the compiler fresh state again, e.g. between two runs in one test"""
+    return lambda: _reset_state(monkeypatch)
+
+
 @pytest.fixture(autouse=True)
-def reset_globals():
-    """Reset global state before each test"""
-    import thrift_compiler
-    thrift_compiler.enums.clear()
-    thrift_compiler.structs.clear()
-    thrift_compiler.services.clear()
-    thrift_compiler.exception_structs.clear()
-    thrift_compiler.alias_map.clear()
-    thrift_compiler.class_index = {}
-    if hasattr(thrift_compiler, 'response_map'):
-        thrift_compiler.response_map = {}
-    yield
-    # Cleanup after test
-    thrift_compiler.enums.clear()
-    thrift_compiler.structs.clear()
-    thrift_compiler.services.clear()
-    thrift_compiler.exception_structs.clear()
-    thrift_compiler.alias_map.clear()
-    thrift_compiler.class_index = {}
+def reset_globals(monkeypatch):
+    """Give each test fresh compiler state, restored afterwards by monkeypatch"""
+    _reset_state(monkeypatch)
@@ -2,14 +2,9 @@
 """Additional tests for helpers, smali utilities, and reporting."""
 
 import json
-import shutil
-import tempfile
-from pathlib import Path
 
 import pytest
 
-import sys
-sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 import thrift_compiler
 
 
@@ -44,6 +39,16 @@ def test_smali_descriptor_parser():
     assert s2j('[I') == 'binary'
 
 
+def test_java_tostring_name_prefers_return_literal():
+    scan = thrift_compiler._scan_java_source
+    # return "X(" anywhere in the file beats an earlier StringBuilder("Y("
+    s = ('public class Q { String a() { return new StringBuilder("Obf50Response(").toString(); }\n'
+         '  public String toString() { return "Other50Request(" + f1 + ")"; } }')
+    assert scan(s)[1] == 'Other50Request'
+    # StringBuilder is the fallback
+    assert scan('return new StringBuilder("Obf50Response(").toString();')[1] == 'Obf50Response'
+
+
 def test_smali_roots_iterators_and_rel(monkeypatch, tmp_path):
     # Create fake smali root and file
     smali_root = tmp_path / 'smali_classesX'
@@ -67,14 +72,7 @@ def test_smali_roots_iterators_and_rel(monkeypatch, tmp_path):
     assert rel == smali_file.relative_to(smali_root).as_posix()
 
 
-def test_write_report_outputs(tmp_path, monkeypatch):
-    # Prepare small state
-    thrift_compiler.enums.clear()
-    thrift_compiler.structs.clear()
-    thrift_compiler.services.clear()
-    thrift_compiler.alias_map.clear()
-    thrift_compiler.exception_structs.clear()
-
+def test_write_report_outputs(tc_env):
     # Add one of each
     en = thrift_compiler.ThriftEnum('E')
     en.values.append(('A', 1))
@@ -86,8 +84,7 @@ def test_write_report_outputs(tmp_path, monkeypatch):
     thrift_compiler.services['Svc'] = svc
     thrift_compiler.alias_map['X1'] = 'X1'
 
-    out = tmp_path / 'out.thrift'
-    monkeypatch.setattr(thrift_compiler, 'OUTPUT_FILE', out, raising=False)
+    _, out = tc_env
 
     thrift_compiler.write_report()
 
@@ -104,16 +101,21 @@ def test_write_report_outputs(tmp_path, monkeypatch):
     assert any(m['name'] == 'do' for m in data['incomplete_methods'])
 
 
-def test_emit_thrift_reserved_and_throws(monkeypatch, tmp_path):
-    # Reset state
-    thrift_compiler.enums.clear()
-    thrift_compiler.structs.clear()
-    thrift_compiler.services.clear()
-    thrift_compiler.alias_map.clear()
-    thrift_compiler.exception_structs.clear()
-    thrift_compiler.emitted_exception_names.clear()
-    thrift_compiler.exception_name_alias.clear()
+def test_write_report_failure_removes_temp_file(tc_env, monkeypatch):
+    _, out = tc_env
+
+    def fail_replace(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(thrift_compiler.os, 'replace', fail_replace)
+    with pytest.raises(OSError):
+        thrift_compiler.write_report()
 
+    assert not out.with_suffix('.report.json.tmp').exists()
+    assert not out.with_suffix('.report.json').exists()
+
+
+def test_emit_thrift_reserved_and_throws(tc_env):
     # Known exception struct
     ex = thrift_compiler.ThriftStruct('KnownException')
     thrift_compiler.structs['KnownException'] = ex
@@ -125,8 +127,7 @@ def test_emit_thrift_reserved_and_throws(monkeypatch, tmp_path):
     svc.add_method('map', 'binary', 'void', exceptions=['UnknownEx', 'KnownException'])
     thrift_compiler.services['S'] = svc
 
-    out = tmp_path / 'emit.thrift'
-    monkeypatch.setattr(thrift_compiler, 'OUTPUT_FILE', out, raising=False)
+    _, out = tc_env
 
     thrift_compiler.emit_thrift()
     c = out.read_text()
@@ -137,10 +138,9 @@ def test_emit_thrift_reserved_and_throws(monkeypatch, tmp_path):
     assert 'throws (1: KnownException ex)' in c
 
 
-def test_parse_services_with_wrappers(monkeypatch, tmp_path):
-    # Setup temporary JAVA_ROOT with minimal files
-    root = tmp_path / 'sources'
-    root.mkdir()
+def test_parse_services_with_wrappers(tc_env):
+    # Temporary JAVA_ROOT with minimal files
+    root, _ = tc_env
     (root / 'services').mkdir()
     # Client with b("doThing")
     (root / 'services' / 'FooService$Client.java').write_text(
@@ -156,15 +156,9 @@ def test_parse_services_with_wrappers(monkeypatch, tmp_path):
     )
 
     # Prepare structs (response known, exception recognized)
-    thrift_compiler.structs.clear()
-    thrift_compiler.services.clear()
-    thrift_compiler.exception_structs.clear()
     thrift_compiler.structs['FooResponse'] = thrift_compiler.ThriftStruct('FooResponse')
     thrift_compiler.exception_structs.add('FooException')
 
-    # Point compiler to our temp JAVA_ROOT
-    monkeypatch.setattr(thrift_compiler, 'JAVA_ROOT', root, raising=False)
-
     thrift_compiler.parse_services()
 
     assert 'FooService' in thrift_compiler.services
@@ -178,3 +172,32 @@ def test_parse_services_with_wrappers(monkeypatch, tmp_path):
     # Exceptions are attached when derivable from result wrappers in absence of better info.
     # Here, signature parsing dominates and exceptions remain empty.
     assert m['exceptions'] == []
+
+
+def test_smali_wrapper_lookup_reads_blanked_java_file(tc_env, tmp_path, monkeypatch):
+    # k.java carries no JAVA_TEXT_MARKERS, so load_sources() keeps no text for it;
+    # the smali args wrapper k.smali shares its stem and resolves to the Java file
+    root, _ = tc_env
+    (root / 'a').mkdir()
+    (root / 'a' / 'k.java').write_text('public class k { public long bar; }')
+    smali_root = tmp_path / 'smali_classes2'
+    smali_root.mkdir()
+    (smali_root / 'k.smali').write_text(
+        '.class public Lk;\n'
+        '.method public toString()Ljava/lang/String;\n'
+        '    const-string v0, "getThing_args("\n'
+        '.end method\n'
+    )
+    (smali_root / 'FooServiceClient.smali').write_text(
+        '.class public LFooServiceClient;\n'
+        '    const-string v1, "getThing"\n'
+        '    invoke-virtual {p0, v1}, LFooServiceClient;->b(Ljava/lang/String;)V\n'
+    )
+    monkeypatch.setattr(thrift_compiler, 'SMALI_ROOTS', [smali_root])
+
+    thrift_compiler.load_sources()
+    thrift_compiler.parse_services()
+
+    m = thrift_compiler.services['FooService'].methods[0]
+    assert m['name'] == 'getThing'
+    assert m['arg_type'] == 'long'
@@ -2,14 +2,7 @@
 """Integration tests for thrift_compiler.py"""
 
 import pytest
-import tempfile
-import shutil
 from pathlib import Path
-from unittest.mock import patch, MagicMock
-import sys
-
-# Add parent directory to path
-sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 
 import thrift_compiler
 
@@ -17,155 +10,53 @@ import thrift_compiler
 class TestIntegration:
     """Integration tests for end-to-end scenarios"""
     
-    def setup_method(self):
-        """Setup test environment"""
-        self.temp_dir = tempfile.mkdtemp()
-        self.java_root = Path(self.temp_dir) / 'sources'
-        self.java_root.mkdir()
-        self.output_file = Path(self.temp_dir) / 'output.thrift'
-        
-        # Clear global state
-        thrift_compiler.enums.clear()
-        thrift_compiler.structs.clear()
-        thrift_compiler.services.clear()
-        thrift_compiler.exception_structs.clear()
-        thrift_compiler.alias_map.clear()
-        thrift_compiler.class_index = {}
-    
-    def teardown_method(self):
-        """Cleanup test environment"""
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
-    
-    def create_java_file(self, rel_path, content):
-        """Helper to create Java file in test directory"""
-        file_path = self.java_root / rel_path
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        file_path.write_text(content)
-        return file_path
-    
-    @patch('thrift_compiler.JAVA_ROOT')
-    @patch('thrift_compiler.OUTPUT_FILE')
-    def test_complete_compilation(self, mock_output, mock_root):
+    def test_complete_compilation(self, corpus_lines):
         """Test complete compilation from Java sources to Thrift IDL"""
-        mock_root.return_value = self.java_root
-        mock_root.exists.return_value = True
-        mock_root.rglob = self.java_root.rglob
-        mock_output.return_value = self.output_file
-        
-        # Create test enum
-        self.create_java_file('enums/Status.java', '''
-public enum Status {
-    ACTIVE(1),
-    INACTIVE(2),
-    PENDING(3);
-}
-''')
-        
-        # Create test struct
-        self.create_java_file('structs/User.java', '''
-public class User implements org.apache.thrift.k {
-    public static final ww1.c f1 = new ww1.c("id", (byte) 10, 1);
-    public static final ww1.c f2 = new ww1.c("name", (byte) 11, 2);
-    public static final ww1.c f3 = new ww1.c("status", (byte) 16, 3);
-    public long f4;
-    public String f5;
-    public Status f6;
-}
-''')
-        
-        # Create test exception
-        self.create_java_file('exceptions/UserException.java', '''
-public class UserException extends org.apache.thrift.i implements org.apache.thrift.k {
-    public static final ww1.c f1 = new ww1.c("message", (byte) 11, 1);
-    public static final ww1.c f2 = new ww1.c("code", (byte) 8, 2);
-    public String f3;
-    public int f4;
-}
-''')
-        
-        # Create test service
-        self.create_java_file('services/UserService.java', '''public class UserService {}''')
-        self.create_java_file('services/UserService$Client.java', '''
-public static class Client {
-    public final User getUser(long userId) throws UserException {
-        b("getUser");
-    }
-    public final void updateUser(User user) throws UserException {
-        b("updateUser");
-    }
-}
-''')
-        
-        # Create obfuscated Response class
-        self.create_java_file('B41/E0.java', '''
-public class E0 implements org.apache.thrift.d {
-    public static final ww1.c f1 = new ww1.c("users", (byte) 15, 1);
-    public ArrayList<User> f2;
-    public String toString() {
-        return new StringBuilder("GetUsersResponse(").toString();
-    }
-}
-''')
-        
-        # Run compiler
-        thrift_compiler.main()
-        
-        # Verify output file was created
-        assert self.output_file.exists()
-        
-        # Read and verify content
-        content = self.output_file.read_text()
-        
-        # Check enum
-        assert 'enum Status {' in content
-        assert 'ACTIVE = 1' in content
-        assert 'INACTIVE = 2' in content
-        assert 'PENDING = 3' in content
-        
-        # Check struct
-        assert 'struct User {' in content
-        assert '1: i64 id' in content
-        assert '2: string name' in content
-        assert '3: enum status' in content
-        
-        # Check exception
-        assert 'exception UserException {' in content
-        assert '1: string message' in content
-        assert '2: i32 code' in content
-        
-        # Check service
-        assert 'service UserService {' in content
-        assert 'User getUser(1: i64 request)' in content
-        assert 'void updateUser(1: User request)' in content
-        
-        # Check obfuscated response
-        assert 'struct GetUsersResponse {' in content
-        assert '1: list<User> users' in content
+        # Status, User, UserException, UserService and the obfuscated B41/E0
+        # response come from the shared corpus in conftest.py
+        expected = frozenset({
+            # Enum
+            'enum Status {',
+            'ACTIVE = 1',
+            'INACTIVE = 2',
+            'PENDING = 3',
+            # Struct
+            'struct User {',
+            '1: i64 id',
+            '2: string name',
+            '3: enum status status',
+            # Exception
+            'exception UserException {',
+            '1: string message',
+            '2: i32 code',
+            # Service
+            'service UserService {',
+            'User getUser(1: i64 request)',
+            'void updateUser(1: User request)',
+            # Obfuscated response
+            'struct GetUsersResponse {',
+            '1: list<User> users',
+        })
+        missing = expected - corpus_lines
+        assert not missing, sorted(missing)
 
 
 class TestIntegrationSmoke:
     """Smoke integration test to ensure end-to-end run works and reports are generated."""
     
-    def setup_method(self):
-        self.temp_dir = tempfile.mkdtemp()
-        self.java_root = Path(self.temp_dir) / 'sources'
-        self.java_root.mkdir()
-        self.output_file = Path(self.temp_dir) / 'output.thrift'
-
-    def teardown_method(self):
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    @pytest.fixture(autouse=True)
+    def _paths(self, tc_env):
+        self.java_root, self.output_file = tc_env
+        # Every input below lives in one of these; create them up front
+        for d in ('enums', 'structs', 'services'):
+            (self.java_root / d).mkdir()
 
     def create_java_file(self, rel_path: str, content: str) -> Path:
         p = self.java_root / rel_path
-        p.parent.mkdir(parents=True, exist_ok=True)
         p.write_text(content)
         return p
 
-    def test_smoke_main(self, monkeypatch):
-        # Point compiler to temp paths
-        monkeypatch.setattr(thrift_compiler, 'JAVA_ROOT', self.java_root, raising=False)
-        monkeypatch.setattr(thrift_compiler, 'OUTPUT_FILE', self.output_file, raising=False)
-
+    def test_smoke_main(self):
         # Minimal inputs to avoid empty output
         self.create_java_file('enums/Status.java', 'public enum Status { ACTIVE(1), INACTIVE(2) }')
         self.create_java_file('structs/User.java', 'public class User implements org.apache.thrift.k { }')
@@ -178,4 +69,53 @@ class TestIntegrationSmoke:
         # Verify outputs
         assert self.output_file.exists()
         assert self.output_file.with_suffix('.report.json').exists()
-        assert self.output_file.with_suffix('.report.txt').exists()
\ No newline at end of file
+        assert self.output_file.with_suffix('.report.txt').exists()
+
+    def _write_parallel_corpus(self):
+        self.create_java_file('enums/Status.java', 'public enum Status { ACTIVE(1), INACTIVE(2) }')
+        for i in range(4):
+            self.create_java_file(f'structs/User{i}.java', f"""
+public class User{i} implements org.apache.thrift.k {{
+    public static final ww1.c f1 = new ww1.c("status", (byte) 16, 1);
+    public Status f2;
+}}""")
+        self.create_java_file('services/UserService.java', 'public class UserService {}')
+        self.create_java_file('services/UserService$Client.java', 'public static class Client { public final User0 get(User1 u){ b("get"); } }')
+
+    def test_parallel_load_matches_serial(self, monkeypatch, reset_compiler):
+        self._write_parallel_corpus()
+        thrift_compiler.main()
+        serial = self.output_file.read_text()
+
+        # Force the process pool on any tree size and core count
+        reset_compiler()
+        monkeypatch.setattr(thrift_compiler, 'PARALLEL_MIN_FILES', 1)
+        monkeypatch.setattr(thrift_compiler.os, 'cpu_count', lambda: 2)
+        thrift_compiler.main()
+
+        assert self.output_file.read_text() == serial
+
+    def test_broken_pool_falls_back_to_serial(self, monkeypatch, reset_compiler):
+        from concurrent.futures.process import BrokenProcessPool
+
+        class DeadPool:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def map(self, *args, **kwargs):
+                raise BrokenProcessPool('worker died')
+
+        self._write_parallel_corpus()
+        thrift_compiler.main()
+        serial = self.output_file.read_text()
+
+        reset_compiler()
+        monkeypatch.setattr(thrift_compiler, 'PARALLEL_MIN_FILES', 1)
+        monkeypatch.setattr(thrift_compiler.os, 'cpu_count', lambda: 2)
+        monkeypatch.setattr('concurrent.futures.ProcessPoolExecutor', DeadPool)
+        thrift_compiler.main()
+
+        assert self.output_file.read_text() == serial
@@ -1,11 +1,13 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from pathlib import Path
 from src.thrift_compiler import parse_enums, enums, read_file, parse_structs, structs, parse_services, services
 
+SOURCES = Path('/workspaces/LINE/compiler/tests/fixtures/sources')
+
 class TestParseEnums(unittest.TestCase):
 
-    @patch('src.thrift_compiler.JAVA_ROOT', Path('/workspaces/LINE/compiler/tests/fixtures/sources'))
+    @patch('src.thrift_compiler.JAVA_ROOT', SOURCES)
     @patch('src.thrift_compiler.read_file')
     def test_parse_enums(self, mock_read_file):
         # Mock file content for enum_sample.java
@@ -14,12 +16,8 @@ class TestParseEnums(unittest.TestCase):
     INACTIVE("Inactive", 2, 3);
 }'''
         
-        # Mock rglob to return only the enum file
-        with patch('pathlib.Path.rglob') as mock_rglob:
-            mock_path = MagicMock()
-            mock_rglob.return_value = [mock_path]
-            mock_path.read_text.return_value = mock_read_file.return_value
-            
+        # The source walk yields only the enum file; read_file serves its text
+        with patch('src.thrift_compiler._iter_java_files', return_value=[SOURCES / 'enum_sample.java']):
             parse_enums()
         
         self.assertIn('Status', enums)
@@ -30,7 +28,7 @@ class TestParseEnums(unittest.TestCase):
 
 class TestParseStructs(unittest.TestCase):
 
-    @patch('src.thrift_compiler.JAVA_ROOT', Path('/workspaces/LINE/compiler/tests/fixtures/sources'))
+    @patch('src.thrift_compiler.JAVA_ROOT', SOURCES)
     @patch('src.thrift_compiler.read_file')
     def test_parse_structs(self, mock_read_file):
         # Mock file content for struct_sample.java
@@ -41,12 +39,8 @@ class TestParseStructs(unittest.TestCase):
     public String name;
 }'''
         
-        # Mock rglob to return only the struct file
-        with patch('pathlib.Path.rglob') as mock_rglob:
-            mock_path = MagicMock()
-            mock_rglob.return_value = [mock_path]
-            mock_path.read_text.return_value = mock_read_file.return_value
-            
+        # The source walk yields only the struct file; read_file serves its text
+        with patch('src.thrift_compiler._iter_java_files', return_value=[SOURCES / 'struct_sample.java']):
             parse_structs()
         
         self.assertIn('UserInfo', structs)
@@ -75,13 +69,10 @@ class TestParseServices(unittest.TestCase):
     }
 }'''
 
-        with patch('src.thrift_compiler.JAVA_ROOT', Path('/workspaces/LINE/compiler/tests/fixtures/sources')):
+        with patch('src.thrift_compiler.JAVA_ROOT', SOURCES):
             with patch('src.thrift_compiler.read_file', return_value=sample):
-                # Mock rglob to return only the service file
-                with patch('pathlib.Path.rglob') as mock_rglob:
-                    mock_path = MagicMock()
-                    mock_rglob.return_value = [mock_path]
-                    mock_path.read_text.return_value = sample
+                # The source walk yields only the service file
+                with patch('src.thrift_compiler._iter_java_files', return_value=[SOURCES / 'service_sample.java']):
                     parse_services()
         
         self.assertIn('UserService', services)
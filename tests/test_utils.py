@@ -1,5 +1,6 @@
 import unittest
 from src.thrift_compiler import normalize_type_name, camel_case, Field, thrift_type_str
+import src
 from src import thrift_compiler
 
 class TestUtils(unittest.TestCase):
@@ -45,5 +46,14 @@ class TestUtils(unittest.TestCase):
         field = Field(1, 'test', 'map', key_type='string', val_type='i64')
         self.assertEqual(thrift_type_str(field), 'map<string,i64>')
 
+class TestPackage(unittest.TestCase):
+
+    def test_main_is_exported_lazily(self):
+        self.assertIs(src.main, src.thrift_compiler.main)
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(AttributeError):
+            src.not_a_name
+
 if __name__ == '__main__':
     unittest.main()